@@ -5,79 +5,94 @@
 import streamlit as st
 import mysql.connector
 from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
 from mysql.connector.pooling import MySQLConnectionPool
 from contextlib import contextmanager
 import time
-import traceback
-
-# Initialize connection pool 
-_pool = None
 
+@st.cache_resource
 def get_pool():
-    """Get or create MySQL connection pool (singleton)"""
-    global _pool
-    if _pool is None:
+    """Get or create MySQL connection pool (one per server process, shared across reruns and sessions)"""
+    try:
+        config = {
+            'host': st.secrets["mysql"]["host"],
+            'port': st.secrets["mysql"]["port"],
+            'user': st.secrets["mysql"]["user"],
+            'password': st.secrets["mysql"]["password"],
+            'database': st.secrets["mysql"]["database"],
+            'charset': 'utf8mb4',
+            'collation': 'utf8mb4_unicode_ci',
+            'autocommit': False,
+            'pool_name': st.secrets["mysql"].get("pool_name", "invoice_pool"),
+            'pool_size': int(st.secrets["mysql"].get("pool_size", 5)),
+            'pool_reset_session': st.secrets["mysql"].get("pool_reset_session", True),
+        }
+        return MySQLConnectionPool(**config)
+    except KeyError as e:
+        st.error(f"Missing MySQL configuration in secrets: {e}")
+        raise
+    except Error as e:
+        st.error(f"Error creating connection pool: {e}")
+        raise
+
+POOL_CHECKOUT_TIMEOUT = 10  # seconds to wait for a free pooled connection
+
+def _checkout(pool, timeout=POOL_CHECKOUT_TIMEOUT):
+    """
+    pool.get_connection(), but wait up to `timeout` seconds for a connection to be handed back
+    when all of them are checked out (the pool itself raises PoolError at once in that case).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
         try:
-            config = {
-                'host': st.secrets["mysql"]["host"],
-                'port': st.secrets["mysql"]["port"],
-                'user': st.secrets["mysql"]["user"],
-                'password': st.secrets["mysql"]["password"],
-                'database': st.secrets["mysql"]["database"],
-                'charset': 'utf8mb4',
-                'collation': 'utf8mb4_unicode_ci',
-                'autocommit': False,
-                'pool_name': st.secrets["mysql"].get("pool_name", "invoice_pool"),
-                'pool_size': int(st.secrets["mysql"].get("pool_size", 5)),
-                'pool_reset_session': st.secrets["mysql"].get("pool_reset_session", True),
-            }
-            _pool = MySQLConnectionPool(**config)
-        except KeyError as e:
-            st.error(f"Missing MySQL configuration in secrets: {e}")
-            raise
-        except Error as e:
-            st.error(f"Error creating connection pool: {e}")
-            raise
-    return _pool
+            return pool.get_connection()
+        except PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
 
-def get_connection():
+def get_connection(report=True):
     """
     Get a connection from the pool with auto-reconnect logic.
     Returns a connection object or None on failure.
+    With report=False failures are not shown with st.error (for best-effort callers).
     """
     max_retries = 3
     retry_delay = 1
     
     for attempt in range(max_retries):
         try:
-            pool = get_pool()
-            conn = pool.get_connection()
-            
-            # Test connection
-            if not conn.is_connected():
-                conn.reconnect(attempts=3, delay=1)
-            
-            return conn
+            # The pool pings each connection on checkout and reconnects stale ones,
+            # so no extra is_connected() round-trip here
+            return _checkout(get_pool())
+        except PoolError as e:
+            # Every connection is busy - the pool is healthy, so don't rebuild it (that would drop
+            # the connections other sessions are using and reconnect them all)
+            if report:
+                st.error(f"No free database connection after {POOL_CHECKOUT_TIMEOUT}s: {e}")
+            return None
         except Error as e:
             if attempt < max_retries - 1:
                 time.sleep(retry_delay * (attempt + 1))
                 # Reset pool on error
-                global _pool
-                _pool = None
+                get_pool.clear()
             else:
-                st.error(f"Failed to get database connection after {max_retries} attempts: {e}")
+                if report:
+                    st.error(f"Failed to get database connection after {max_retries} attempts: {e}")
                 return None
         except Exception as e:
-            st.error(f"Unexpected error getting connection: {e}")
+            if report:
+                st.error(f"Unexpected error getting connection: {e}")
             return None
     
     return None
 
 @contextmanager
-def get_db_connection():
+def get_db_connection(report=True):
     """
     Context manager for database connections.
     Ensures connection is properly closed even on errors.
+    Errors are shown with st.error and re-raised; report=False only re-raises.
     
     Usage:
         with get_db_connection() as conn:
@@ -87,25 +102,32 @@ def get_db_connection():
     """
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(report)
         if conn is None:
             raise Exception("Failed to get database connection")
         yield conn
     except Error as e:
         if conn and conn.is_connected():
             conn.rollback()
-        st.error(f"Database error: {e}")
+        if report:
+            st.error(f"Database error: {e}")
         raise
     except Exception as e:
         if conn and conn.is_connected():
             conn.rollback()
-        st.error(f"Unexpected error: {e}")
+        if report:
+            st.error(f"Unexpected error: {e}")
         raise
     finally:
-        if conn and conn.is_connected():
-            conn.close()
+        if conn:
+            # Hand the connection back to the pool without another ping; a dead one is
+            # still returned so the pool can reconnect it on the next checkout
+            try:
+                conn.close()
+            except Error:
+                pass
 
-def execute_query(query, params=None, commit=False):
+def execute_query(query, params=None, commit=False, report=True):
     """
     Execute a query (INSERT, UPDATE, DELETE) and optionally commit.
     
@@ -113,11 +135,12 @@ def execute_query(query, params=None, commit=False):
         query: SQL query string
         params: Tuple or list of parameters
         commit: Whether to commit the transaction
+        report: Show errors with st.error before re-raising (False for best-effort callers)
     
     Returns:
         cursor.lastrowid for INSERT, or number of affected rows
     """
-    with get_db_connection() as conn:
+    with get_db_connection(report) as conn:
         try:
             cursor = conn.cursor()
             cursor.execute(query, params or ())
@@ -128,14 +151,53 @@ def execute_query(query, params=None, commit=False):
             return result
         except Error as e:
             conn.rollback()
-            st.error(f"Query execution error: {e}")
+            if report:
+                st.error(f"Query execution error: {e}")
+            raise
+        except Exception as e:
+            conn.rollback()
+            if report:
+                st.error(f"Unexpected error executing query: {e}")
+            raise
+
+def execute_many(query, params_seq, commit=False, report=True):
+    """
+    Execute one parameterized statement for many rows (bulk INSERT/UPDATE).
+    mysql-connector rewrites a multi-row INSERT into a single statement.
+
+    Args:
+        query: SQL query string
+        params_seq: Sequence of parameter tuples
+        commit: Whether to commit the transaction
+        report: Show errors with st.error before re-raising (False for best-effort callers)
+
+    Returns:
+        Number of affected rows
+    """
+    params_seq = list(params_seq)
+    if not params_seq:
+        return 0
+    with get_db_connection(report) as conn:
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(query, params_seq)
+            result = cursor.rowcount
+            if commit:
+                conn.commit()
+            cursor.close()
+            return result
+        except Error as e:
+            conn.rollback()
+            if report:
+                st.error(f"Bulk execution error: {e}")
             raise
         except Exception as e:
             conn.rollback()
-            st.error(f"Unexpected error executing query: {e}")
+            if report:
+                st.error(f"Unexpected error executing bulk query: {e}")
             raise
 
-def fetch_all(query, params=None):
+def fetch_all(query, params=None, raise_errors=False, report=True):
     """
     Execute a SELECT query and return all results.
     Always fetches fresh data (no caching).
@@ -143,11 +205,14 @@ def fetch_all(query, params=None):
     Args:
         query: SQL query string
         params: Tuple or list of parameters
+        raise_errors: Re-raise query errors instead of returning [] (for cached readers,
+                      so a failed read is not cached as an empty result)
+        report: Show errors with st.error (False for best-effort callers such as gst_cache)
     
     Returns:
         List of tuples (rows)
     """
-    with get_db_connection() as conn:
+    with get_db_connection(report) as conn:
         try:
             cursor = conn.cursor()
             cursor.execute(query, params or ())
@@ -155,13 +220,19 @@ def fetch_all(query, params=None):
             cursor.close()
             return results
         except Error as e:
-            st.error(f"Fetch error: {e}")
+            if report:
+                st.error(f"Fetch error: {e}")
+            if raise_errors:
+                raise
             return []
         except Exception as e:
-            st.error(f"Unexpected error fetching data: {e}")
+            if report:
+                st.error(f"Unexpected error fetching data: {e}")
+            if raise_errors:
+                raise
             return []
 
-def fetch_one(query, params=None):
+def fetch_one(query, params=None, raise_errors=False, report=True):
     """
     Execute a SELECT query and return first result.
     Always fetches fresh data (no caching).
@@ -169,11 +240,14 @@ def fetch_one(query, params=None):
     Args:
         query: SQL query string
         params: Tuple or list of parameters
+        raise_errors: Re-raise query errors instead of returning None (for cached readers,
+                      so a failed read is not cached as a missing row)
+        report: Show errors with st.error (False for best-effort callers such as gst_cache)
     
     Returns:
         Single tuple (row) or None
     """
-    with get_db_connection() as conn:
+    with get_db_connection(report) as conn:
         try:
             cursor = conn.cursor()
             cursor.execute(query, params or ())
@@ -181,10 +255,16 @@ def fetch_one(query, params=None):
             cursor.close()
             return result
         except Error as e:
-            st.error(f"Fetch error: {e}")
+            if report:
+                st.error(f"Fetch error: {e}")
+            if raise_errors:
+                raise
             return None
         except Exception as e:
-            st.error(f"Unexpected error fetching data: {e}")
+            if report:
+                st.error(f"Unexpected error fetching data: {e}")
+            if raise_errors:
+                raise
             return None
 
 def safe_commit(conn):
@@ -262,6 +342,15 @@ def init_db():
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
             
+            # Create GST lookup cache table (raw Appyflow payloads, survives app restarts)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS gst_cache (
+                    gstin VARCHAR(15) PRIMARY KEY,
+                    payload MEDIUMTEXT NOT NULL,
+                    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            
             conn.commit()
             cursor.close()
         except Error as e:
@@ -306,4 +395,34 @@ def migrate_db_add_columns():
             cursor.close()
         except Error as e:
             st.error(f"Migration error: {e}")
+            raise
 
+
+def migrate_db_add_indexes():
+    """Migrate database schema - add lookup indexes missing from tables created by older versions"""
+    with get_db_connection() as conn:
+        try:
+            cursor = conn.cursor()
+            
+            # Indexes used by the client dropdown (ORDER BY name) and History (date range)
+            indexes_to_add = {
+                'clients': {'idx_name': '(name)'},
+                'invoices': {'idx_invoice_date': '(invoice_date)'},
+            }
+            
+            for table, indexes in indexes_to_add.items():
+                # Get existing indexes
+                cursor.execute(f"SHOW INDEX FROM {table}")
+                existing_idx = {row[2] for row in cursor.fetchall()}
+                for idx_name, idx_cols in indexes.items():
+                    if idx_name not in existing_idx:
+                        try:
+                            cursor.execute(f"ALTER TABLE {table} ADD INDEX {idx_name} {idx_cols}")
+                            conn.commit()
+                        except Error:
+                            pass  # Index might already exist
+            
+            cursor.close()
+        except Error as e:
+            st.error(f"Migration error: {e}")
+            raise
@@ -8,15 +8,24 @@
 import streamlit as st
 from datetime import date, datetime, timedelta
 from db import (
-    get_connection, get_db_connection, execute_query, 
-    fetch_all, fetch_one, safe_commit, init_db, migrate_db_add_columns
+    get_connection, get_db_connection, execute_query, execute_many,
+    fetch_all, fetch_one, safe_commit, init_db, migrate_db_add_columns,
+    migrate_db_add_indexes
 )
 import pandas as pd
 import os
-import traceback
+import io
+import importlib.util
+import json
+import copy
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from num2words import num2words
 from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import time
 
 # ReportLabb
@@ -25,16 +34,23 @@ from reportlab.lib import colors
 from reportlab.lib.units import mm
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    Image, PageBreak, Flowable
+    Image, PageBreak, CondPageBreak, Flowable
 )
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab import rl_config
+
+# Store compressed streams as raw binary instead of ASCII85 text (smaller PDFs, less encoding work)
+rl_config.useA85 = 0
 
 # ---------------- Constants ----------------
 APP_TITLE = "Crux Invoice Management System"
 APP_BUILT_BY = "Built by Aiclex Technologies"
 PDF_DIR = "generated_pdfs"
+HISTORY_PAGE_SIZE = 50
 ASSETS_DIR = "assets"
 os.makedirs(PDF_DIR, exist_ok=True)
 os.makedirs(ASSETS_DIR, exist_ok=True)
@@ -59,41 +75,214 @@ COMPANY = {
     "calibri_ttf": os.path.join(ASSETS_DIR, "Calibri.ttf")
 }
 
-# Register Calibri if provided
-FONT_NAME = "Helvetica"
-if os.path.exists(COMPANY["calibri_ttf"]):
-    try:
-        pdfmetrics.registerFont(TTFont("Calibri", COMPANY["calibri_ttf"]))
-    except Exception:
-        FONT_NAME = "Helvetica"
-
-# Styles - Reduced font sizes and leading for compact layout
-base_styles = getSampleStyleSheet()
-BODY_STYLE = ParagraphStyle("body", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=8, leading=9.5)  # Reduced from 9/11
-HEADER_STYLE = ParagraphStyle("header", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=10, leading=11, alignment=1)  # Reduced from 11/12
-TITLE_STYLE = ParagraphStyle("title", parent=base_styles["Heading1"], fontName=FONT_NAME, fontSize=14, leading=16, alignment=1)  # Reduced from 16/18
-RIGHT_STYLE = ParagraphStyle("right", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=8, leading=9.5, alignment=2)  # Reduced from 9/11
-DESC_STYLE = ParagraphStyle("desc", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=8, leading=9.5)  # Reduced from 9/11
-TOTAL_LABEL_STYLE = ParagraphStyle("tot_label", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=9, leading=10.5)  # Reduced from 10/12
-TOTAL_VALUE_STYLE = ParagraphStyle("tot_val", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=9, leading=10.5, alignment=2)  # Reduced from 10/12
-FOOTER_STYLE = ParagraphStyle("footer", parent=base_styles["Normal"], fontName=FONT_NAME, fontSize=7, leading=8, alignment=1)
+# Fonts and styles are built once per server process - this script re-executes on every rerun.
+# The cached objects are shared by all sessions, so treat them as read-only.
+@st.cache_resource
+def build_pdf_styles():
+    """Register Calibri if provided and build the ParagraphStyles used by the PDF"""
+    font_name = "Helvetica"
+    if os.path.exists(COMPANY["calibri_ttf"]):
+        try:
+            pdfmetrics.registerFont(TTFont("Calibri", COMPANY["calibri_ttf"]))
+        except Exception:
+            font_name = "Helvetica"
+
+    # Styles - Reduced font sizes and leading for compact layout
+    base_styles = getSampleStyleSheet()
+    return font_name, {
+        "body": ParagraphStyle("body", parent=base_styles["Normal"], fontName=font_name, fontSize=8, leading=9.5),  # Reduced from 9/11
+        "header": ParagraphStyle("header", parent=base_styles["Normal"], fontName=font_name, fontSize=10, leading=11, alignment=1),  # Reduced from 11/12
+        "title": ParagraphStyle("title", parent=base_styles["Heading1"], fontName=font_name, fontSize=14, leading=16, alignment=1),  # Reduced from 16/18
+        "right": ParagraphStyle("right", parent=base_styles["Normal"], fontName=font_name, fontSize=8, leading=9.5, alignment=2),  # Reduced from 9/11
+        "desc": ParagraphStyle("desc", parent=base_styles["Normal"], fontName=font_name, fontSize=8, leading=9.5),  # Reduced from 9/11
+        "tot_label": ParagraphStyle("tot_label", parent=base_styles["Normal"], fontName=font_name, fontSize=9, leading=10.5),  # Reduced from 10/12
+        "tot_val": ParagraphStyle("tot_val", parent=base_styles["Normal"], fontName=font_name, fontSize=9, leading=10.5, alignment=2),  # Reduced from 10/12
+        "footer": ParagraphStyle("footer", parent=base_styles["Normal"], fontName=font_name, fontSize=7, leading=8, alignment=1),
+        "vend_header": ParagraphStyle("vend_header", fontName=font_name, fontSize=11, leading=13, alignment=1),
+        "tot_bold_label": ParagraphStyle("tot_bold_label", fontName=font_name, fontSize=11, leading=13),
+        "tot_bold_val": ParagraphStyle("tot_bold_val", fontName=font_name, fontSize=11, leading=13, alignment=2),
+        "sup_header": ParagraphStyle("sh", fontName=font_name, fontSize=9, leading=10, alignment=1),
+        "sup_cell": ParagraphStyle("cell", fontName=font_name, fontSize=7, leading=8),
+    }
+
+FONT_NAME, _styles = build_pdf_styles()
+BODY_STYLE = _styles["body"]
+HEADER_STYLE = _styles["header"]
+TITLE_STYLE = _styles["title"]
+RIGHT_STYLE = _styles["right"]
+DESC_STYLE = _styles["desc"]
+TOTAL_LABEL_STYLE = _styles["tot_label"]
+TOTAL_VALUE_STYLE = _styles["tot_val"]
+FOOTER_STYLE = _styles["footer"]
+VENDOR_HEADER_STYLE = _styles["vend_header"]
+TOTAL_BOLD_LABEL_STYLE = _styles["tot_bold_label"]
+TOTAL_BOLD_VALUE_STYLE = _styles["tot_bold_val"]
+SUPPORTING_HEADER_STYLE = _styles["sup_header"]
+SUPPORTING_CELL_STYLE = _styles["sup_cell"]
+
+# Page geometry - A4 with 12mm side margins is fixed, so table widths are resolved once at import
+PAGE_WIDTH = A4[0] - (12*mm + 12*mm)
+# SL.NO, PARTICULARS, DESCRIPTION (takes the remainder), SAC CODE, QTY, RATE, TAXABLE AMOUNT
+_ITEM_FIXED_W = (12*mm, 45*mm, None, 22*mm, 14*mm, 22*mm, 26*mm)
+_desc_w = PAGE_WIDTH - sum(w for w in _ITEM_FIXED_W if w)
+ITEM_COL_WIDTHS = tuple(_desc_w if w is None else w for w in _ITEM_FIXED_W)
+if sum(ITEM_COL_WIDTHS) > PAGE_WIDTH:
+    ITEM_COL_WIDTHS = tuple(w * PAGE_WIDTH / sum(ITEM_COL_WIDTHS) for w in ITEM_COL_WIDTHS)
+
+# Table styles - the invoice layout is fixed, so these are built once and shared by every PDF.
+# Table.setStyle copies the commands into the table, so a shared TableStyle is never mutated.
+# INVOICE title with single border - reduced padding for tighter layout
+TITLE_TABLE_STYLE = TableStyle([
+    ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),
+    ('LINEBELOW', (0,0), (-1,0), 1.0, colors.black),
+    ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),
+    ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+])
+
+# GST/PAN/Phone row with shared borders
+GST_TABLE_STYLE = TableStyle([
+    ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),
+    ('LINEBELOW', (0,-1), (-1,-1), 1.0, colors.black),
+    ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),
+    ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),
+    ('LINEAFTER', (0,0), (0,-1), 1.0, colors.black),  # Vertical line after first column
+    ('LINEAFTER', (1,0), (1,-1), 1.0, colors.black),  # Vertical line after second column
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('LEFTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
+    ('RIGHTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
+])
+
+# Vendor Electronic Remittance table with light grey borders (nested table)
+LIGHT_GREY = colors.HexColor('#D3D3D3')
+BANK_TABLE_STYLE = TableStyle([
+    # Light grey borders with thinner width (0.5 instead of 1.0) and reduced padding
+    ('BOX', (0,0), (-1,-1), 0.5, LIGHT_GREY),
+    ('INNERGRID', (0,0), (-1,-1), 0.5, LIGHT_GREY),
+    ('LINEAFTER', (0,0), (0,-1), 0.5, LIGHT_GREY),  # Vertical line between label and value
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('TOPPADDING', (0,0), (-1,-1), 6),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+    ('LEFTPADDING', (0,0), (-1,-1), 6),
+    ('RIGHTPADDING', (0,0), (-1,-1), 6),
+    ('ALIGN', (0,0), (0,-1), 'LEFT'),
+    ('ALIGN', (1,0), (1,-1), 'LEFT'),
+])
+
+# Service Location / Invoice details with shared borders
+DETAILS_TABLE_STYLE = TableStyle([
+    ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),
+    ('LINEBELOW', (0,-1), (-1,-1), 1.0, colors.black),
+    ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),
+    ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),
+    ('LINEAFTER', (0,0), (0,-1), 1.0, colors.black),  # Vertical line after Service Location column
+    ('LINEAFTER', (1,0), (1,0), 1.0, colors.black),  # Vertical line between Invoice No and Date - ONLY in row 0
+    ('LINEBELOW', (0,0), (-1,0), 1.0, colors.black),  # Line below headers
+    ('LINEBELOW', (0,3), (-1,3), 1.0, colors.black),  # Line above Purchase Order
+    # Span columns 1 and 2 for rows below the header (merge Invoice No and Date columns)
+    ('SPAN', (1,1), (2,1)),  # Address row
+    ('SPAN', (1,2), (2,2)),  # Client address row
+    ('SPAN', (1,3), (2,3)),  # GSTIN row
+    ('SPAN', (1,4), (2,4)),  # Purchase Order row
+    # Box the GSTIN cell (left column, row index 3) so it has its own borders
+    ('BOX', (0,3), (0,3), 1.0, colors.black),
+    ('VALIGN', (0,0), (-1,-1), 'TOP'),
+    ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('LEFTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
+    ('RIGHTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
+])
+
+ITEM_HEADERS = ("SL.NO","PARTICULARS","DESCRIPTION of SAC CODE","SAC CODE","QTY","RATE","TAXABLE AMOUNT")
+# Items table - header row + data rows; commands use relative indices so one style fits any row count
+ITEM_TABLE_STYLE = TableStyle([
+    ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),  # Top border
+    ('LINEBELOW', (0,-1), (-1,-1), 1.0, colors.black),  # Bottom border
+    ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),  # Left border
+    ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),  # Right border
+    ('LINEBELOW', (0,0), (-1,0), 1.0, colors.black),  # Header bottom border
+    ('LINEAFTER', (0,0), (0,-1), 1.0, colors.black),  # Column dividers
+    ('LINEAFTER', (1,0), (1,-1), 1.0, colors.black),
+    ('LINEAFTER', (2,0), (2,-1), 1.0, colors.black),
+    ('LINEAFTER', (3,0), (3,-1), 1.0, colors.black),
+    ('LINEAFTER', (4,0), (4,-1), 1.0, colors.black),
+    ('LINEAFTER', (5,0), (5,-1), 1.0, colors.black),
+    ('LINEBELOW', (0,0), (-1,-2), 0.5, colors.black),  # Thinner row dividers
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('ALIGN', (0,0), (0,-1), 'CENTER'),  # Center align first column
+    ('ALIGN', (-3,1), (-1,-1), 'RIGHT'),  # Right align last 3 columns
+    ('LEFTPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('RIGHTPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
+    ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),  # Header background
+    ('FONT', (0,1), (-1,-1), FONT_NAME, 8, 9.5),  # Plain-string cells match BODY_STYLE/RIGHT_STYLE
+])
+
+# Totals block
+TOTALS_TABLE_STYLE = TableStyle([
+    ('INNERGRID',(0,0),(-1,-2),0.25,colors.lightgrey),
+    ('LINEABOVE',(0,-1),(-1,-1),0.8,colors.black),
+    ('BACKGROUND', (0,-1), (-1,-1), colors.lightgrey),
+    ('ALIGN',(1,0),(1,-1),'RIGHT'),
+    ('LEFTPADDING',(0,0),(-1,-1),3),  # Aggressively reduced to 3
+    ('RIGHTPADDING',(0,0),(-1,-1),3),  # Aggressively reduced to 3
+    ('TOPPADDING',(0,0),(-1,-1),2),  # Added aggressive top padding reduction
+    ('BOTTOMPADDING',(0,0),(-1,-1),2)  # Added aggressive bottom padding reduction
+])
+
+# Supporting Excel data pages
+SUPPORTING_ROWS_PER_TABLE = 200
+# Chunks after the first carry no header row; continuation pages get theirs from the page callback
+SUPPORTING_BODY_STYLE = TableStyle([
+    ('GRID',(0,0),(-1,-1),0.25,colors.grey),
+    ('VALIGN',(0,0),(-1,-1),'TOP'),
+    ('LEFTPADDING',(0,0),(-1,-1),2),
+    ('RIGHTPADDING',(0,0),(-1,-1),2),
+    ('FONT',(0,0),(-1,-1),FONT_NAME,7,8),  # Plain-string cells match SUPPORTING_CELL_STYLE
+])
+SUPPORTING_TABLE_STYLE = TableStyle([
+    ('BACKGROUND',(0,0),(-1,0),colors.whitesmoke),
+], parent=SUPPORTING_BODY_STYLE)
+FRAME_PADDING = 6  # ReportLab's default Frame padding, used by SimpleDocTemplate
 
 # Helpers
+# Parsed once - Decimal literals are otherwise re-parsed on every call
+CENT = Decimal("0.01")
+ZERO_MONEY = Decimal("0.00")
+SGST_RATE = Decimal("0.09")  # CGST is charged at the same rate
+IGST_RATE = Decimal("0.18")
+
 def money(v):
-    return Decimal(str(v)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    # Decimal and int convert exactly; anything else (float, str) goes through str() as before
+    if not isinstance(v, Decimal):
+        v = Decimal(v) if isinstance(v, int) else Decimal(str(v))
+    return v.quantize(CENT, rounding=ROUND_HALF_UP)
+
+@lru_cache(maxsize=4096)
+def _num_words(n):
+    """Title-cased Indian-English words for a non-negative integer (memoized - amounts repeat,
+    and there are only 100 distinct paise values)"""
+    return num2words(n, lang='en_IN').replace('-', ' ').title()
 
 def rupees_in_words(amount):
+    # Split on the quantized Decimal with integer arithmetic - no float round-trip
     try:
-        amt = float(amount)
+        cents = int(money(amount) * 100)
     except:
         return ""
-    rupees = int(amt)
-    paise = int(round((amt - rupees) * 100))
+    # Negative amounts (advance above total) read as zero, as before
+    rupees, paise = divmod(max(cents, 0), 100)
     parts = []
     if rupees > 0:
-        parts.append(num2words(rupees, lang='en_IN').replace('-', ' ').title() + " Rupees")
+        parts.append(_num_words(rupees) + " Rupees")
     if paise > 0:
-        parts.append(num2words(paise, lang='en_IN').replace('-', ' ').title() + " Paise")
+        parts.append(_num_words(paise) + " Paise")
     if not parts:
         return "Zero Rupees Only"
     return " and ".join(parts) + " Only"
@@ -107,6 +296,9 @@ def gst_state_code(gstin):
         pass
     return ""
 
+# Company GSTIN is fixed config - parse its state code once
+COMPANY_STATE_CODE = gst_state_code(COMPANY.get('gstin',''))
+
 STATE_MAP = {
     "01":"JK","02":"HP","03":"PB","04":"CH","05":"HR","06":"DL","07":"RJ","08":"UP","09":"UK","10":"BR",
     "11":"SK","12":"AR","13":"NL","14":"MN","15":"MZ","16":"TR","17":"ML","18":"AS","19":"WB","20":"JH",
@@ -118,6 +310,71 @@ def state_label_from_gst(gstin):
     sc = gst_state_code(gstin)
     return STATE_MAP.get(sc, sc) if sc else ""
 
+# Asset images - read each JPEG from disk once per server process and reuse the bytes for every
+# invoice (st.cache_resource, since this script's module globals are rebuilt on each rerun).
+# mtime is part of the key so replacing an asset file is picked up without a restart.
+# Only the immutable bytes are shared: ImageReaders wrap a seekable handle, so each PDF build
+# gets fresh ones, and ReportLab already embeds a repeated image once per document.
+
+# Largest size (points) each asset is drawn at. Images are downscaled to 2x this before embedding,
+# so the PDF doesn't carry full-resolution scans. 0 means "not constrained on this axis".
+ASSET_DRAW_PT = {
+    COMPANY["logo_top"]: (220, 60),
+    COMPANY["tagline"]: (400, 15),
+    COMPANY["signature"]: (44.6*mm, 31.3*mm),
+    COMPANY["company_text"]: (A4[0] - 40*mm, 0),  # scaled to page width minus 20mm each side
+}
+
+def _downscale_jpeg(data, draw_pt):
+    """
+    Shrink an image (keeping its aspect ratio) until one axis reaches 2x its drawn size in points,
+    so both axes keep at least 2x resolution. Never upscales; returns the original bytes when the
+    saving is small or Pillow can't handle the file.
+    """
+    try:
+        from PIL import Image as PILImage
+        with PILImage.open(io.BytesIO(data)) as img:
+            w, h = img.size
+            scale = max(draw_pt[0] * 2 / w, draw_pt[1] * 2 / h)
+            if scale > 0.9:
+                return data  # not worth a lossy re-encode
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), PILImage.LANCZOS)
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=90, optimize=True)
+            return out.getvalue()
+    except Exception:
+        return data
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _img_bytes(path, mtime):
+    with open(path, 'rb') as f:
+        data = f.read()
+    draw_pt = ASSET_DRAW_PT.get(path)
+    return _downscale_jpeg(data, draw_pt) if draw_pt else data
+
+def asset_bytes(path):
+    """Return cached bytes for an asset image, or None if the file is missing"""
+    if not path:
+        return None
+    # One stat per use: the mtime doubles as the existence check and the cache key
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    return _img_bytes(path, mtime)
+
+def asset_image(path, width=None, height=None):
+    """Build a ReportLab Image flowable from the cached asset bytes, or None if missing"""
+    data = asset_bytes(path)
+    return Image(io.BytesIO(data), width=width, height=height) if data else None
+
+def asset_reader(path):
+    """Build an ImageReader (for canvas.drawImage) from the cached asset bytes, or None if missing"""
+    data = asset_bytes(path)
+    return ImageReader(io.BytesIO(data)) if data else None
+
 def safe_rerun():
     """Safely rerun Streamlit app - updated to use st.rerun()"""
     try:
@@ -131,19 +388,23 @@ def safe_rerun():
             pass
 
 # DB helpers - Updated to use MySQL with connection pooling
-# Note: init_db() and migrate_db_add_columns() are now in db.py
+# Note: init_db(), migrate_db_add_columns() and migrate_db_add_indexes() are now in db.py
 
+# Client reads are cached across reruns; every client write calls invalidate_client_cache().
+# They raise on a failed query (raise_errors=True) so an error is never cached as "no clients".
+@st.cache_data(ttl="5m", max_entries=4)
 def get_clients():
-    """Get all clients - always fetches fresh data"""
+    """Get all clients (cached until a client is added/updated/deleted)"""
     query = """
         SELECT id, name, gstin, pan, address, email, purchase_order, state_code 
         FROM clients 
         ORDER BY name
     """
-    return fetch_all(query)
+    return fetch_all(query, raise_errors=True)
 
+@st.cache_data(ttl="5m", max_entries=256)
 def get_client_by_id(cid):
-    """Get client by ID - always fetches fresh data"""
+    """Get client by ID (cached until a client is added/updated/deleted)"""
     query = """
         SELECT id, name, gstin, pan, address, email, purchase_order, state_code,
                graduate_qty, graduate_rate, undergraduate_qty, undergraduate_rate,
@@ -152,44 +413,90 @@ def get_client_by_id(cid):
         FROM clients 
         WHERE id = %s
     """
-    return fetch_one(query, (cid,))
+    return fetch_one(query, (cid,), raise_errors=True)
+
+CLIENT_COLUMNS = ['id','name','gstin','pan','address','email','purchase_order','state_code']
+
+CLIENT_TABLE_COLUMNS = ['name','gstin','state_code','purchase_order']
+
+@st.cache_data(ttl="5m", max_entries=4)
+def get_clients_df():
+    """The Manage Clients table - only the displayed columns, projected once and cached with get_clients"""
+    return pd.DataFrame(get_clients(), columns=CLIENT_COLUMNS)[CLIENT_TABLE_COLUMNS]
+
+@st.cache_data(ttl="5m", max_entries=4)
+def get_client_options(with_po=False):
+    """
+    Dropdown labels -> client id, built once per client-list change instead of on every rerun.
+    Labels stay the selectbox options, so an edited or re-sorted list resets the selection
+    rather than shifting it onto another client.
+    """
+    options = {}
+    for cid, name, gstin, pan, addr, email, po, stc in get_clients():
+        # Use stored state_code if available, otherwise derive from GSTIN
+        state_code = stc or gst_state_code(gstin) if gstin else ""
+        stlbl = f"-{STATE_MAP.get(state_code, state_code)}" if state_code else ""
+        po_part = f" | PO:{po}" if (with_po and po) else ""
+        options[f"{name} | {gstin} {stlbl}{po_part}"] = cid
+    return options
+
+def invalidate_client_cache():
+    """Drop cached client reads after a write"""
+    get_clients.clear()
+    get_clients_df.clear()
+    get_client_options.clear()
+    get_client_by_id.clear()
+
+UPSERT_CLIENT_SQL = """
+    INSERT INTO clients 
+    (name, gstin, pan, address, email, purchase_order, state_code,
+     graduate_qty, graduate_rate, undergraduate_qty, undergraduate_rate,
+     candidates_qty, candidates_rate, exam_fee_qty, exam_fee_rate,
+     handbooks_qty, handbooks_rate) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    name = VALUES(name),
+    pan = VALUES(pan),
+    address = VALUES(address),
+    email = VALUES(email),
+    purchase_order = VALUES(purchase_order),
+    state_code = VALUES(state_code),
+    graduate_qty = VALUES(graduate_qty),
+    graduate_rate = VALUES(graduate_rate),
+    undergraduate_qty = VALUES(undergraduate_qty),
+    undergraduate_rate = VALUES(undergraduate_rate),
+    candidates_qty = VALUES(candidates_qty),
+    candidates_rate = VALUES(candidates_rate),
+    exam_fee_qty = VALUES(exam_fee_qty),
+    exam_fee_rate = VALUES(exam_fee_rate),
+    handbooks_qty = VALUES(handbooks_qty),
+    handbooks_rate = VALUES(handbooks_rate)
+"""
 
 def add_client(name, gstin, pan, address, email="", purchase_order="", state_code="",
                graduate_qty="", graduate_rate="", undergraduate_qty="", undergraduate_rate="",
                candidates_qty="", candidates_rate="", exam_fee_qty="", exam_fee_rate="",
                handbooks_qty="", handbooks_rate=""):
     """Add or update client (INSERT ... ON DUPLICATE KEY UPDATE)"""
-    query = """
-        INSERT INTO clients 
-        (name, gstin, pan, address, email, purchase_order, state_code,
-         graduate_qty, graduate_rate, undergraduate_qty, undergraduate_rate,
-         candidates_qty, candidates_rate, exam_fee_qty, exam_fee_rate,
-         handbooks_qty, handbooks_rate) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-        name = VALUES(name),
-        pan = VALUES(pan),
-        address = VALUES(address),
-        email = VALUES(email),
-        purchase_order = VALUES(purchase_order),
-        state_code = VALUES(state_code),
-        graduate_qty = VALUES(graduate_qty),
-        graduate_rate = VALUES(graduate_rate),
-        undergraduate_qty = VALUES(undergraduate_qty),
-        undergraduate_rate = VALUES(undergraduate_rate),
-        candidates_qty = VALUES(candidates_qty),
-        candidates_rate = VALUES(candidates_rate),
-        exam_fee_qty = VALUES(exam_fee_qty),
-        exam_fee_rate = VALUES(exam_fee_rate),
-        handbooks_qty = VALUES(handbooks_qty),
-        handbooks_rate = VALUES(handbooks_rate)
-    """
     params = (name, gstin, pan, address, email, purchase_order, state_code,
               graduate_qty, graduate_rate, undergraduate_qty, undergraduate_rate,
               candidates_qty, candidates_rate, exam_fee_qty, exam_fee_rate,
               handbooks_qty, handbooks_rate)
     try:
-        execute_query(query, params, commit=True)
+        execute_query(UPSERT_CLIENT_SQL, params, commit=True)
+        invalidate_client_cache()
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
+def add_clients_bulk(rows):
+    """
+    Add or update many clients in one multi-row upsert and a single commit.
+    rows: tuples in UPSERT_CLIENT_SQL column order.
+    """
+    try:
+        execute_many(UPSERT_CLIENT_SQL, rows, commit=True)
+        invalidate_client_cache()
         return True, None
     except Exception as e:
         return False, str(e)
@@ -215,6 +522,7 @@ def update_client(cid, name, gstin, pan, address, email="", purchase_order="", s
               handbooks_qty, handbooks_rate, cid)
     try:
         execute_query(query, params, commit=True)
+        invalidate_client_cache()
     except Exception as e:
         st.error(f"Error updating client: {e}")
 
@@ -223,9 +531,60 @@ def delete_client(cid):
     query = "DELETE FROM clients WHERE id = %s"
     try:
         execute_query(query, (cid,), commit=True)
+        invalidate_client_cache()
     except Exception as e:
         st.error(f"Error deleting client: {e}")
 
+INSERT_INVOICE_SQL = """
+    INSERT INTO invoices 
+    (invoice_no, invoice_date, client_id, subtotal, sgst, cgst, igst, total, pdf_path) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def save_invoices(rows):
+    """Insert invoice rows (tuples in INSERT_INVOICE_SQL column order) in one statement"""
+    result = execute_many(INSERT_INVOICE_SQL, rows, commit=True)
+    invalidate_history_cache()
+    return result
+
+# History page queries - fixed text, only the date range and LIMIT/OFFSET are bound per page,
+# so the range filter runs on idx_invoice_date and each page fetches at most HISTORY_PAGE_SIZE rows
+HISTORY_COUNT_SQL = "SELECT COUNT(*) FROM invoices WHERE invoice_date BETWEEN %s AND %s"
+HISTORY_PAGE_SQL = """
+    SELECT inv.id, inv.invoice_no, inv.invoice_date, c.name AS client_name, 
+           c.gstin AS client_gstin, c.purchase_order,
+           inv.subtotal, inv.sgst, inv.cgst, inv.igst, inv.total, inv.pdf_path
+    FROM invoices inv
+    LEFT JOIN clients c ON inv.client_id = c.id
+    WHERE inv.invoice_date BETWEEN %s AND %s
+    ORDER BY inv.id DESC
+    LIMIT %s OFFSET %s
+"""
+HISTORY_COLUMNS = [
+    'id', 'invoice_no', 'invoice_date', 'client_name', 
+    'client_gstin', 'purchase_order',
+    'subtotal', 'sgst', 'cgst', 'igst', 'total', 'pdf_path'
+]
+
+# Cached briefly so paging back and forth doesn't re-query; invoice writes call invalidate_history_cache().
+# A failed query raises (raise_errors=True) rather than being cached as an empty page.
+@st.cache_data(ttl="30s", max_entries=4)
+def count_invoices(start, end):
+    """Number of invoices dated between start and end (inclusive, 'YYYY-MM-DD')"""
+    row = fetch_one(HISTORY_COUNT_SQL, (start, end), raise_errors=True)
+    return row[0] if row else 0
+
+@st.cache_data(ttl="30s", max_entries=32)
+def fetch_invoice_page(start, end, page, page_size=HISTORY_PAGE_SIZE):
+    """One page (1-based) of invoices in the date range, newest first, as a DataFrame"""
+    rows = fetch_all(HISTORY_PAGE_SQL, (start, end, page_size, (page - 1) * page_size), raise_errors=True)
+    return pd.DataFrame(rows, columns=HISTORY_COLUMNS) if rows else pd.DataFrame()
+
+def invalidate_history_cache():
+    """Drop cached History pages after an invoice write"""
+    count_invoices.clear()
+    fetch_invoice_page.clear()
+
 
 def render_invoice_preview(meta, rows, subtotal, force_igst=False, advance_received=0.0):
     """Render a professional bordered invoice preview in the Streamlit UI using HTML/CSS with light-grey borders."""
@@ -468,64 +827,147 @@ def render_invoice_preview(meta, rows, subtotal, force_igst=False, advance_recei
     st.markdown(final_html, unsafe_allow_html=True)
 
 # GST API
-def fetch_gst_from_appyflow(gstin, timeout=8):
+APPYFLOW_URL = "https://appyflow.in/api/verifyGST"
+# Address fields of pradr.addr, in the order they are joined into the client address
+GST_ADDR_KEYS = ("bno","st","loc","city","dst","pncd","stcd","bn","addr1","addr2","state")
+# Concurrent lookups during bulk verification (also the HTTP connection pool size)
+GST_VERIFY_WORKERS = 8
+
+class _GSTApiError(Exception):
+    """Appyflow answered but reported the lookup as failed"""
+
+@st.cache_resource
+def gst_http_session():
+    """
+    Shared HTTP session for GST lookups - keeps the TLS connection to Appyflow alive between
+    lookups. Connection/read errors and 429/5xx answers are retried with 0.3s backoff (3 attempts).
+    """
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), raise_on_status=False)
+    session = requests.Session()
+    session.headers.update({"User-Agent": "aiclex-invoice/1.0"})
+    session.mount("https://", HTTPAdapter(pool_maxsize=GST_VERIFY_WORKERS, max_retries=retry))
+    return session
+
+GST_CACHE_MAX_AGE_DAYS = 7
+
+def _gst_cache_get(gstin):
+    """Stored payload for a GSTIN if fetched within GST_CACHE_MAX_AGE_DAYS, else None"""
+    try:
+        row = fetch_one("SELECT payload FROM gst_cache WHERE gstin = %s AND fetched_at >= NOW() - INTERVAL %s DAY",
+                        (gstin, GST_CACHE_MAX_AGE_DAYS), report=False)
+        return json.loads(row[0]) if row else None
+    except Exception:
+        return None  # cache is best-effort and silent (report=False); fall through to the API
+
+GST_CACHE_BATCH = 500
+
+def _gst_cache_get_many(gstins):
+    """{gstin: payload} for every GSTIN stored within GST_CACHE_MAX_AGE_DAYS, in a few IN (...) queries"""
+    gstins = list(dict.fromkeys(g for g in gstins if g))
+    found = {}
+    for start in range(0, len(gstins), GST_CACHE_BATCH):
+        batch = gstins[start:start + GST_CACHE_BATCH]
+        try:
+            rows = fetch_all("SELECT gstin, payload FROM gst_cache WHERE gstin IN (%s) AND fetched_at >= NOW() - INTERVAL %%s DAY"
+                             % ", ".join(["%s"] * len(batch)), (*batch, GST_CACHE_MAX_AGE_DAYS), report=False)
+            found.update((g, json.loads(payload)) for g, payload in rows)
+        except Exception:
+            pass  # best-effort and silent, as in _gst_cache_get
+    return found
+
+GST_CACHE_UPSERT_SQL = """
+    INSERT INTO gst_cache (gstin, payload) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE payload = VALUES(payload), fetched_at = CURRENT_TIMESTAMP
+"""
+
+def _gst_cache_put(gstin, payload):
+    try:
+        execute_query(GST_CACHE_UPSERT_SQL, (gstin, json.dumps(payload)), commit=True, report=False)
+    except Exception:
+        pass
+
+def _gst_cache_put_many(payloads):
+    """Store {gstin: payload} in one multi-row upsert (bulk verify, after its workers finish)"""
+    try:
+        execute_many(GST_CACHE_UPSERT_SQL, [(g, json.dumps(j)) for g, j in payloads.items()], commit=True, report=False)
+    except Exception:
+        pass
+
+@st.cache_data(ttl="24h", max_entries=1024, show_spinner=False)
+def _appyflow_verify(gstin, key, timeout=8, _throttle=None, _db_cache=True, _session=None):
+    """Raw Appyflow payload for a GSTIN (upper-cased).
+    Only successful lookups are cached (in memory, and in the gst_cache table so restarts keep them) -
+    failures raise, so they are retried next time. _throttle (not part of the cache key) is called
+    just before a real API request, so cache hits are never rate-limited. With _db_cache=False the
+    gst_cache table is neither read nor written - bulk verify's worker threads do that in batches
+    on the script thread instead of each taking a pooled connection. _session: gst_http_session()
+    already resolved on the script thread (worker threads have no ScriptRunContext)."""
+    if _db_cache:
+        j = _gst_cache_get(gstin)
+        if j is not None:
+            return j
+    if _throttle:
+        _throttle()
+    r = (_session or gst_http_session()).get(APPYFLOW_URL, params={"key_secret": key, "gstNo": gstin}, timeout=timeout)
+    r.raise_for_status()
+    j = r.json()
+    if isinstance(j, dict) and ("taxpayerInfo" in j or j.get("error") is False or j.get("status") == "success"):
+        if _db_cache:
+            _gst_cache_put(gstin, j)
+        return j
+    msg = j.get("message") if isinstance(j, dict) else str(j)
+    raise _GSTApiError(msg or "API returned error")
+
+@st.cache_resource(ttl="10m", show_spinner=False)
+def appyflow_key():
+    """Appyflow key from secrets, else env var - resolved once rather than on every lookup
+    (bulk verification calls this per row, from several threads)"""
+    try:
+        return st.secrets["appyflow"]["key_secret"]
+    except Exception:
+        return os.getenv("APPYFLOW_KEY_SECRET")
+
+def fetch_gst_from_appyflow(gstin, timeout=8, throttle=None, payload=None, db_cache=True, key=None, session=None):
     gstin = str(gstin).strip()
     if not gstin:
         return {"ok": False, "error": "Empty GSTIN"}
-    key = None
-    try:
-        key = st.secrets["appyflow"]["key_secret"]
-    except Exception:
-        key = os.getenv("APPYFLOW_KEY_SECRET")
+    if key is None:
+        key = appyflow_key()
     if not key:
         return {"ok": False, "error": "API key missing in secrets or env var."}
-    url = "https://appyflow.in/api/verifyGST"
-    params = {"key_secret": key, "gstNo": gstin}
     try:
-        r = requests.get(url, params=params, timeout=timeout)
-        r.raise_for_status()
-        j = r.json()
+        # payload: an Appyflow response the caller already has (bulk verify prefetches gst_cache)
+        j = payload if payload is not None else _appyflow_verify(gstin.upper(), key, timeout, _throttle=throttle,
+                                                                 _db_cache=db_cache, _session=session)
+    except _GSTApiError as e:
+        return {"ok": False, "error": str(e)}
     except Exception as e:
         return {"ok": False, "error": f"Request failed: {e}"}
-    if isinstance(j, dict) and ("taxpayerInfo" in j or j.get("error") is False or j.get("status") == "success"):
-        info = j.get("taxpayerInfo") or j.get("taxpayerinfo") or j.get("taxpayer") or j
-        name = info.get("tradeNam") or info.get("lgnm") or info.get("tradeName") or info.get("name") or ""
+    info = j.get("taxpayerInfo") or j.get("taxpayerinfo") or j.get("taxpayer") or j
+    name = info.get("tradeNam") or info.get("lgnm") or info.get("tradeName") or info.get("name") or ""
+    addr = ""
+    state_code_from_api = None
+    try:
+        pradr = info.get("pradr",{}) or {}
+        # Canonicalize key case once (the API has used both "stcd" and "STCD"); empty values are dropped
+        a = {str(k).lower(): v for k, v in (pradr.get("addr",{}) or {}).items() if v}
+        addr = ", ".join(str(a[k]) for k in GST_ADDR_KEYS if k in a)
+        # Try to extract state code from API response, then from the main info object
+        stcd = a.get("stcd") or info.get("stcd") or info.get("STCD")
+        if stcd:
+            state_code_from_api = str(stcd).strip().zfill(2)  # Ensure 2 digits
+    except (AttributeError, TypeError, KeyError):
         addr = ""
-        state_code_from_api = None
-        try:
-            pradr = info.get("pradr",{}) or {}
-            a = pradr.get("addr",{}) or {}
-            parts = []
-            for k in ("bno","st","loc","city","dst","pncd","stcd","bn","addr1","addr2","state"):
-                v = a.get(k) or a.get(k.upper()) or a.get(k.lower())
-                if v:
-                    parts.append(str(v))
-            addr = ", ".join(parts)
-            # Try to extract state code from API response
-            if a.get("stcd"):
-                state_code_from_api = str(a.get("stcd")).strip().zfill(2)  # Ensure 2 digits
-            elif a.get("STCD"):
-                state_code_from_api = str(a.get("STCD")).strip().zfill(2)
-            # Also check if state code is in the main info object
-            if not state_code_from_api:
-                if info.get("stcd"):
-                    state_code_from_api = str(info.get("stcd")).strip().zfill(2)
-                elif info.get("STCD"):
-                    state_code_from_api = str(info.get("STCD")).strip().zfill(2)
-        except:
-            addr = ""
-        pan = None
-        for pk in ("pan","panno","panNo","PAN"):
-            if info.get(pk):
-                pan = str(info.get(pk)).strip(); break
-        if not pan and len(gstin) >= 12:
-            pan = gstin[2:12].upper()
-        # Use state code from API if available, otherwise derive from GSTIN
-        state_code = state_code_from_api or gst_state_code(gstin)
-        return {"ok": True, "name": name, "address": addr, "gstin": gstin, "pan": pan, "state_code": state_code, "raw": j}
-    else:
-        msg = j.get("message") if isinstance(j, dict) else str(j)
-        return {"ok": False, "error": msg or "API returned error"}
+    pan = None
+    for pk in ("pan","panno","panNo","PAN"):
+        if info.get(pk):
+            pan = str(info.get(pk)).strip(); break
+    if not pan and len(gstin) >= 12:
+        pan = gstin[2:12].upper()
+    # Use state code from API if available, otherwise derive from GSTIN
+    state_code = state_code_from_api or gst_state_code(gstin)
+    return {"ok": True, "name": name, "address": addr, "gstin": gstin, "pan": pan, "state_code": state_code, "raw": j}
 
 # HR Flowable
 class HR(Flowable):
@@ -537,41 +979,46 @@ class HR(Flowable):
         self.canv.setStrokeColor(self.color)
         self.canv.line(0,0,self.width,0)
 
+# Zero-size marker: sets (or clears) the header row the later-page callback repeats
+class SupportingHeaderMark(Flowable):
+    _ZEROSIZE = True  # still placed when the page is exactly full
+    def __init__(self, state, header):
+        Flowable.__init__(self)
+        self.state = state; self.header = header
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+    def draw(self):
+        self.state['header'] = self.header
+
 # Signature and company text handler for onPage callback
 def add_signature_and_company_text(canv, doc, signature_path, signature_width, signature_height, company_text_path):
     """Callback function to add signature at bottom left and company_text at bottom of page 1"""
     page_num = canv.getPageNumber()
     if page_num == 1:
         # Add signature at bottom left
-        if signature_path and os.path.exists(signature_path):
+        sig_reader = asset_reader(signature_path)
+        if sig_reader:
             try:
                 # Position: 35mm from bottom to avoid overlap with content, 12mm from left (matching left margin)
                 sig_y_position = 35*mm  # Increased to 35mm to move stamp higher and avoid overlap
                 sig_x_position = 12*mm
                 
                 # Draw the signature image at fixed position on page 1
-                canv.drawImage(signature_path, sig_x_position, sig_y_position, 
+                canv.drawImage(sig_reader, sig_x_position, sig_y_position, 
                               width=signature_width, height=signature_height, 
                               preserveAspectRatio=True, mask='auto')
             except Exception:
                 pass  # Silently fail if signature image cannot be drawn
         
         # Add company_text at bottom center (above signature)
-        if company_text_path and os.path.exists(company_text_path):
+        img_reader = asset_reader(company_text_path)
+        if img_reader:
             try:
                 # Get page dimensions
                 page_width = A4[0]
                 
-                # Load image to get dimensions - use PIL/Pillow approach
-                try:
-                    from PIL import Image as PILImage
-                    with PILImage.open(company_text_path) as img:
-                        img_width, img_height = img.size
-                except:
-                    # Fallback: try to open and measure using reportlab Image
-                    from reportlab.lib.utils import ImageReader
-                    img_reader = ImageReader(company_text_path)
-                    img_width, img_height = img_reader.getSize()
+                # Measure from the cached bytes (same reader is used for drawing)
+                img_width, img_height = img_reader.getSize()
                 
                 # Scale to fit page width with margin (leaving ~20mm on each side)
                 max_width = page_width - 40*mm
@@ -586,7 +1033,7 @@ def add_signature_and_company_text(canv, doc, signature_path, signature_width, s
                 comp_x_position = (page_width - scaled_width) / 2  # Centered horizontally
                 
                 # Draw the company_text image at bottom center
-                canv.drawImage(company_text_path, comp_x_position, comp_y_position, 
+                canv.drawImage(img_reader, comp_x_position, comp_y_position, 
                               width=scaled_width, height=scaled_height, 
                               preserveAspectRatio=True, mask='auto')
             except Exception:
@@ -601,10 +1048,6 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     - Avoid whole-column-black bug by calculating row index dynamically.
     - Place stamp (signature image) at bottom-right on supporting page last page.
     """
-    from decimal import Decimal, ROUND_HALF_UP
-    def q(v):
-        return Decimal(str(v)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
     # Normalize/prep rows: allow blank (None or "")
     prepared = []
     for idx, r in enumerate(line_items, start=1):
@@ -626,21 +1069,23 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
                 rate_val = float(str(rate_raw).replace(",", "").strip())
         except:
             rate_val = None
-        taxable_num = q(qty_val * rate_val) if (qty_val is not None and rate_val is not None) else Decimal("0.00")
+        taxable_num = money(qty_val * rate_val) if (qty_val is not None and rate_val is not None) else ZERO_MONEY
         prepared.append({
             "slno": r.get('slno') or idx,
             "particulars": partic,
             "description": desc,
             "sac_code": sac,
             "qty": qty_val,
-            "rate": q(rate_val) if rate_val is not None else None,
+            "rate": money(rate_val) if rate_val is not None else None,
             "taxable_amount": taxable_num
         })
 
     filename = f"Invoice_{invoice_meta.get('invoice_no','NA')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
     path = os.path.join(PDF_DIR, filename)
     # Minimized top margin to 3mm for maximum space efficiency
-    doc = SimpleDocTemplate(path, pagesize=A4, leftMargin=12*mm, rightMargin=12*mm, topMargin=3*mm, bottomMargin=12*mm)
+    # Pin page compression on / invariant off so output doesn't depend on rl_config, and start in our font
+    doc = SimpleDocTemplate(path, pagesize=A4, leftMargin=12*mm, rightMargin=12*mm, topMargin=3*mm, bottomMargin=12*mm,
+                            pageCompression=1, invariant=0, initialFontName=FONT_NAME)
     
     # Add signature and company_text to page 1 using onPage callback
     signature_path = COMPANY.get('signature', '')
@@ -652,35 +1097,47 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     def on_first_page(canv, doc):
         add_signature_and_company_text(canv, doc, signature_path, signature_width, signature_height, company_text_path)
     doc.onFirstPage = on_first_page
+
+    # Supporting sheets are laid out in row chunks and only the first chunk of each column slice has
+    # a header row, so continuation pages draw the current slice's header here and start the frame below it
+    sup_header = {'header': None}
+    def on_later_page(canv, doc):
+        frame = doc.pageTemplate.frames[0]
+        frame.topPadding = FRAME_PADDING
+        hdr = sup_header['header']
+        if hdr is None:
+            return
+        aW = frame.width - frame.leftPadding - frame.rightPadding
+        w, h = hdr.wrapOn(canv, aW, frame.height)
+        hdr.drawOn(canv, frame.x1 + frame.leftPadding + (aW - w) / 2, frame.y1 + frame.height - FRAME_PADDING - h)
+        frame.topPadding = FRAME_PADDING + h
+    doc.onLaterPages = on_later_page
     
     story = []
-    page_width = A4[0] - (12*mm + 12*mm)
+    page_width = PAGE_WIDTH
 
     def add_image_if(path, w_mm=None, h_mm=None, align='CENTER', spacer_after=4):
-        if path and os.path.exists(path):
-            try:
-                w = (w_mm*mm) if w_mm else None
-                h = (h_mm*mm) if h_mm else None
-                img = Image(path, width=w, height=h) if (w and h) else Image(path)
+        try:
+            w = (w_mm*mm) if w_mm else None
+            h = (h_mm*mm) if h_mm else None
+            img = asset_image(path, width=w, height=h) if (w and h) else asset_image(path)
+            if img:
                 img.hAlign = align
-                story.append(img)
-                if spacer_after:
-                    story.append(Spacer(1, spacer_after))
-            except Exception:
-                pass
+                story.extend((img, Spacer(1, spacer_after)) if spacer_after else (img,))
+        except Exception:
+            pass
 
     # Add company logo (centered) - no extra spacing before
-    if os.path.exists(COMPANY.get('logo_top','')):
-        logo = Image(COMPANY.get('logo_top'), width=220, height=60)
+    logo = asset_image(COMPANY.get('logo_top'), width=220, height=60)
+    if logo:
         logo.hAlign = 'CENTER'
         story.append(logo)
     
     # Add tagline image - minimal spacing after logo
-    if os.path.exists(COMPANY.get('tagline','')):
-        tagline = Image(COMPANY.get('tagline'), width=400, height=15)
+    tagline = asset_image(COMPANY.get('tagline'), width=400, height=15)
+    if tagline:
         tagline.hAlign = 'CENTER'
-        story.append(tagline)
-        story.append(Spacer(1, 2))  # Very minimal spacing after tagline (reduced from 4 to 2)
+        story.extend((tagline, Spacer(1, 2)))  # Very minimal spacing after tagline (reduced from 4 to 2)
     else:
         # If no tagline, add very minimal spacing after logo
         story.append(Spacer(1, 2))
@@ -690,16 +1147,7 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     
     # 1. INVOICE title with single border - reduced padding for tighter layout
     invoice_title = Table([[Paragraph("INVOICE", TITLE_STYLE)]], colWidths=[page_width])
-    invoice_title.setStyle(TableStyle([
-        ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),
-        ('LINEBELOW', (0,0), (-1,0), 1.0, colors.black),
-        ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),
-        ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-    ]))
+    invoice_title.setStyle(TITLE_TABLE_STYLE)
     story.append(invoice_title)
 
     # 2. GST/PAN/Phone row with shared borders
@@ -709,26 +1157,13 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
         Paragraph(f"Phone No. {COMPANY.get('phone','')}", RIGHT_STYLE)
     ]]
     gst_table = Table(gst_data, colWidths=[page_width*0.4, page_width*0.35, page_width*0.25])
-    gst_table.setStyle(TableStyle([
-        ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),
-        ('LINEBELOW', (0,-1), (-1,-1), 1.0, colors.black),
-        ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),
-        ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),
-        ('LINEAFTER', (0,0), (0,-1), 1.0, colors.black),  # Vertical line after first column
-        ('LINEAFTER', (1,0), (1,-1), 1.0, colors.black),  # Vertical line after second column
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('LEFTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
-        ('RIGHTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
-    ]))
+    gst_table.setStyle(GST_TABLE_STYLE)
     story.append(gst_table)
 
     # 3. Service Location and Invoice Details with shared borders
     client = invoice_meta.get('client', {}) or {}
     
     # Create Vendor Electronic Remittance table with light grey borders (nested table)
-    light_grey = colors.HexColor('#D3D3D3')
     bank_details_data = [
         [Paragraph("<b>Bank Name</b>", BODY_STYLE), Paragraph(COMPANY.get('bank_name',''), BODY_STYLE)],
         [Paragraph("<b>A/C No</b>", BODY_STYLE), Paragraph(COMPANY.get('bank_account',''), BODY_STYLE)],
@@ -742,19 +1177,7 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     parent_cell_width = page_width * 0.5
     available_width = parent_cell_width - 12  # Subtract parent padding (6+6)
     bank_table = Table(bank_details_data, colWidths=[available_width*0.38, available_width*0.62])
-    bank_table.setStyle(TableStyle([
-        # Light grey borders with thinner width (0.5 instead of 1.0) and reduced padding
-        ('BOX', (0,0), (-1,-1), 0.5, light_grey),
-        ('INNERGRID', (0,0), (-1,-1), 0.5, light_grey),
-        ('LINEAFTER', (0,0), (0,-1), 0.5, light_grey),  # Vertical line between label and value
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 6),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-        ('LEFTPADDING', (0,0), (-1,-1), 6),
-        ('RIGHTPADDING', (0,0), (-1,-1), 6),
-        ('ALIGN', (0,0), (0,-1), 'LEFT'),
-        ('ALIGN', (1,0), (1,-1), 'LEFT'),
-    ]))
+    bank_table.setStyle(BANK_TABLE_STYLE)
     
     # Combine all details into a single table structure
     # For the header row, we'll use a 3-column layout: Service Location | Invoice No | Date
@@ -771,7 +1194,7 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
         
         # Client address and Vendor header row
         [Paragraph(client.get('address','').replace("\n", "<br/>"), BODY_STYLE),
-         Paragraph("<b>Vendor Electronic Remittance</b>", ParagraphStyle("vend_header", fontName=FONT_NAME, fontSize=11, leading=13, alignment=1)),
+         Paragraph("<b>Vendor Electronic Remittance</b>", VENDOR_HEADER_STYLE),
          Paragraph("", BODY_STYLE)],
         
         # GSTIN and Bank details row
@@ -784,39 +1207,13 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     ]
 
     details_table = Table(details_data, colWidths=[page_width*0.5, page_width*0.25, page_width*0.25])
-    details_table.setStyle(TableStyle([
-        ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),
-        ('LINEBELOW', (0,-1), (-1,-1), 1.0, colors.black),
-        ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),
-        ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),
-        ('LINEAFTER', (0,0), (0,-1), 1.0, colors.black),  # Vertical line after Service Location column
-        ('LINEAFTER', (1,0), (1,0), 1.0, colors.black),  # Vertical line between Invoice No and Date - ONLY in row 0
-        ('LINEBELOW', (0,0), (-1,0), 1.0, colors.black),  # Line below headers
-        ('LINEBELOW', (0,3), (-1,3), 1.0, colors.black),  # Line above Purchase Order
-        # Span columns 1 and 2 for rows below the header (merge Invoice No and Date columns)
-        ('SPAN', (1,1), (2,1)),  # Address row
-        ('SPAN', (1,2), (2,2)),  # Client address row
-        ('SPAN', (1,3), (2,3)),  # GSTIN row
-        ('SPAN', (1,4), (2,4)),  # Purchase Order row
-        # Box the GSTIN cell (left column, row index 3) so it has its own borders
-        ('BOX', (0,3), (0,3), 1.0, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('LEFTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
-        ('RIGHTPADDING', (0,0), (-1,-1), 3),  # Aggressively reduced to 3
-    ]))
+    details_table.setStyle(DETAILS_TABLE_STYLE)
     
-    story.append(details_table)
-    story.append(Spacer(1, 2))  # Aggressively reduced to 2
+    story.extend((details_table, Spacer(1, 2)))  # Aggressively reduced to 2
 
     # Items table
-    headers = ["SL.NO","PARTICULARS","DESCRIPTION of SAC CODE","SAC CODE","QTY","RATE","TAXABLE AMOUNT"]
-    col_w = [12*mm, 45*mm, (page_width - (12*mm + 45*mm + 22*mm + 14*mm + 22*mm + 26*mm)), 22*mm, 14*mm, 22*mm, 26*mm]
-    total_w = sum(col_w)
-    if total_w > page_width:
-        scale = page_width / total_w
-        col_w = [w*scale for w in col_w]
+    headers = ITEM_HEADERS
+    col_w = list(ITEM_COL_WIDTHS)
 
     table_data = [[Paragraph(h, HEADER_STYLE) for h in headers]]
     # We'll append rows and compute current row index dynamically
@@ -825,19 +1222,23 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
         part = r['particulars']
         desc = r['description']
         sac = r['sac_code']
+        qty, rate, taxable = r['qty'], r['rate'], r['taxable_amount']
         # Display: if None => blank; if numeric 0 -> show blank (per user's preference)
-        qty_display = "" if (r['qty'] is None or float(r['qty']) == 0.0) else (str(int(r['qty'])) if float(r['qty']).is_integer() else str(r['qty']))
-        rate_display = "" if (r['rate'] is None or float(r['rate']) == 0.0) else f"{r['rate']:,.2f}"
-        tax_display = "" if (r['qty'] is None or r['rate'] is None or (r['taxable_amount'] == Decimal("0.00"))) else f"{r['taxable_amount']:,.2f}"
+        # qty is a float and rate a Decimal (or None), so a plain truth test covers both
+        qty_display = "" if not qty else (str(int(qty)) if qty.is_integer() else str(qty))
+        rate_display = "" if not rate else f"{rate:,.2f}"
+        tax_display = "" if (qty is None or rate is None or taxable == ZERO_MONEY) else f"{taxable:,.2f}"
 
+        # Short single-line cells are plain strings (font/alignment from ITEM_TABLE_STYLE);
+        # only the free-text columns need Paragraph wrapping
         row = [
             Paragraph(sl, BODY_STYLE),
             Paragraph(part, BODY_STYLE),
             Paragraph(desc, DESC_STYLE),
-            Paragraph(sac, BODY_STYLE),
-            Paragraph(qty_display, RIGHT_STYLE),
-            Paragraph(rate_display, RIGHT_STYLE),
-            Paragraph(tax_display, RIGHT_STYLE)
+            sac,
+            qty_display,
+            rate_display,
+            tax_display
         ]
         table_data.append(row)
 
@@ -850,13 +1251,10 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     train_val = invoice_meta.get('training_dates') or invoice_meta.get('training_exam_dates') or invoice_meta.get('training') or ""
     if train_val:
         # create a row where PARTICULARS column (index 1) has the label and DESCRIPTION column (index 2) has the date value
-        training_row = [Paragraph("", BODY_STYLE),
+        training_row = ["",
                         Paragraph("<b>Training Dates/Exam Dates:</b>", BODY_STYLE),
                         Paragraph(train_val, DESC_STYLE),
-                        Paragraph("", BODY_STYLE),
-                        Paragraph("", BODY_STYLE),
-                        Paragraph("", BODY_STYLE),
-                        Paragraph("", BODY_STYLE)]
+                        "", "", "", ""]
         table_data.append(training_row)
     
     # Append Process Name inside the items table as a final row (below Training/Exam Dates)
@@ -864,13 +1262,10 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     process_val = invoice_meta.get('process_name') or ""
     if process_val:
         # create a row where PARTICULARS column (index 1) has the label and DESCRIPTION column (index 2) has the process name value
-        process_row = [Paragraph("", BODY_STYLE),
+        process_row = ["",
                        Paragraph("<b>Process Name:</b>", BODY_STYLE),
                        Paragraph(process_val, DESC_STYLE),
-                       Paragraph("", BODY_STYLE),
-                       Paragraph("", BODY_STYLE),
-                       Paragraph("", BODY_STYLE),
-                       Paragraph("", BODY_STYLE)]
+                       "", "", "", ""]
         table_data.append(process_row)
     
     # Append Advance Received inside the items table (below Process Name, if present)
@@ -878,50 +1273,25 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     adv_received = invoice_meta.get('advance_received', 0) or 0
     if adv_received > 0:
         # create a row where PARTICULARS column (index 1) has the label and DESCRIPTION column (index 2) has the advance value
-        adv_row = [Paragraph("", BODY_STYLE),
+        adv_row = ["",
                    Paragraph("<b>Advance Received:</b>", BODY_STYLE),
                    Paragraph(f"{float(adv_received):,.2f}", DESC_STYLE),
-                   Paragraph("", BODY_STYLE),
-                   Paragraph("", BODY_STYLE),
-                   Paragraph("", BODY_STYLE),
-                   Paragraph("", BODY_STYLE)]
+                   "", "", "", ""]
         table_data.append(adv_row)
 
     items_tbl = Table(table_data, colWidths=col_w, repeatRows=1)
-    tbl_style = [
-        ('LINEABOVE', (0,0), (-1,0), 1.0, colors.black),  # Top border
-        ('LINEBELOW', (0,-1), (-1,-1), 1.0, colors.black),  # Bottom border
-        ('LINEBEFORE', (0,0), (0,-1), 1.0, colors.black),  # Left border
-        ('LINEAFTER', (-1,0), (-1,-1), 1.0, colors.black),  # Right border
-        ('LINEBELOW', (0,0), (-1,0), 1.0, colors.black),  # Header bottom border
-        ('LINEAFTER', (0,0), (0,-1), 1.0, colors.black),  # Column dividers
-        ('LINEAFTER', (1,0), (1,-1), 1.0, colors.black),
-        ('LINEAFTER', (2,0), (2,-1), 1.0, colors.black),
-        ('LINEAFTER', (3,0), (3,-1), 1.0, colors.black),
-        ('LINEAFTER', (4,0), (4,-1), 1.0, colors.black),
-        ('LINEAFTER', (5,0), (5,-1), 1.0, colors.black),
-        ('LINEBELOW', (0,0), (-1,-2), 0.5, colors.black),  # Thinner row dividers
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('ALIGN', (0,0), (0,-1), 'CENTER'),  # Center align first column
-        ('ALIGN', (-3,1), (-1,-1), 'RIGHT'),  # Right align last 3 columns
-        ('LEFTPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('RIGHTPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('TOPPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),  # Aggressively reduced to 2
-        ('BACKGROUND', (0,0), (-1,0), colors.whitesmoke),  # Header background
-    ]
     # Blank cells will appear as empty/white (no black background)
-
-    items_tbl.setStyle(TableStyle(tbl_style))
+    items_tbl.setStyle(ITEM_TABLE_STYLE)
     story.append(items_tbl)
 
     
 
     # Totals calculation
-    subtotal = sum([r['taxable_amount'] for r in prepared]) if prepared else Decimal("0.00")
-    adv = Decimal(str(invoice_meta.get('advance_received', 0) or 0)).quantize(Decimal("0.01"))
+    # Exact Decimal sum of the already-quantized row amounts (floats could drift a paisa on the printed invoice)
+    subtotal = sum((r['taxable_amount'] for r in prepared), ZERO_MONEY)
+    adv = Decimal(str(invoice_meta.get('advance_received', 0) or 0)).quantize(CENT)
     
-    comp_state = gst_state_code(COMPANY.get('gstin',''))
+    comp_state = COMPANY_STATE_CODE
     cli_state = gst_state_code(client.get('gstin','')) if client.get('gstin') else ""
     # Determine IGST usage: checkbox overrides everything (same logic as preview)
     force_igst = invoice_meta.get('use_igst', False)
@@ -937,16 +1307,16 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
 
     # Calculate taxes on the original subtotal
     if use_igst:
-        igst = (subtotal * Decimal('0.18')).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        sgst = cgst = Decimal('0.00')
+        igst = (subtotal * IGST_RATE).quantize(CENT, rounding=ROUND_HALF_UP)
+        sgst = cgst = ZERO_MONEY
     else:
-        sgst = (subtotal * Decimal('0.09')).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        cgst = (subtotal * Decimal('0.09')).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        igst = Decimal('0.00')
+        # SGST and CGST are the same 9% of the same subtotal - compute once
+        sgst = cgst = (subtotal * SGST_RATE).quantize(CENT, rounding=ROUND_HALF_UP)
+        igst = ZERO_MONEY
 
     # Calculate total after taxes, then subtract advance from final total
     total = subtotal + sgst + cgst + igst
-    net = (total - adv).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    net = (total - adv).quantize(CENT, rounding=ROUND_HALF_UP)
 
     totals_rows = []
     totals_rows.append([Paragraph("Sub Total", TOTAL_LABEL_STYLE), Paragraph(f"Rs. {subtotal:,.2f}", TOTAL_VALUE_STYLE)])
@@ -957,30 +1327,22 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     totals_rows.append([Paragraph("CGST (9%)", TOTAL_LABEL_STYLE), Paragraph(cgst_display, TOTAL_VALUE_STYLE)])
     igst_display = f"Rs. {igst:,.2f}" if igst > 0 else "Rs. 0.00"
     totals_rows.append([Paragraph("IGST (18%)", TOTAL_LABEL_STYLE), Paragraph(igst_display, TOTAL_VALUE_STYLE)])
-    totals_rows.append([Paragraph("<b>TOTAL</b>", ParagraphStyle("tot_bold_label", fontName=FONT_NAME, fontSize=11, leading=13)),
-                        Paragraph(f"<b>Rs. {total:,.2f}</b>", ParagraphStyle("tot_bold_val", fontName=FONT_NAME, fontSize=11, leading=13, alignment=2))])
+    totals_rows.append([Paragraph("<b>TOTAL</b>", TOTAL_BOLD_LABEL_STYLE),
+                        Paragraph(f"<b>Rs. {total:,.2f}</b>", TOTAL_BOLD_VALUE_STYLE)])
     # Show Less Advance Received row only if it exists (greater than 0)
     if adv > 0:
         totals_rows.append([Paragraph("Less Advance Received", TOTAL_LABEL_STYLE), Paragraph(f"Rs. {adv:,.2f}", TOTAL_VALUE_STYLE)])
-    totals_rows.append([Paragraph("<b>Payable To Crux</b>", ParagraphStyle("tot_bold_label", fontName=FONT_NAME, fontSize=11, leading=13)),
-                        Paragraph(f"<b>Rs. {net:,.2f}</b>", ParagraphStyle("tot_bold_val", fontName=FONT_NAME, fontSize=11, leading=13, alignment=2))])
+    totals_rows.append([Paragraph("<b>Payable To Crux</b>", TOTAL_BOLD_LABEL_STYLE),
+                        Paragraph(f"<b>Rs. {net:,.2f}</b>", TOTAL_BOLD_VALUE_STYLE)])
 
     tot_tbl = Table(totals_rows, colWidths=[page_width*0.65, page_width*0.35], hAlign='RIGHT')
-    tot_tbl.setStyle(TableStyle([
-        ('INNERGRID',(0,0),(-1,-2),0.25,colors.lightgrey),
-        ('LINEABOVE',(0,-1),(-1,-1),0.8,colors.black),
-        ('BACKGROUND', (0,-1), (-1,-1), colors.lightgrey),
-        ('ALIGN',(1,0),(1,-1),'RIGHT'),
-        ('LEFTPADDING',(0,0),(-1,-1),3),  # Aggressively reduced to 3
-        ('RIGHTPADDING',(0,0),(-1,-1),3),  # Aggressively reduced to 3
-        ('TOPPADDING',(0,0),(-1,-1),2),  # Added aggressive top padding reduction
-        ('BOTTOMPADDING',(0,0),(-1,-1),2)  # Added aggressive bottom padding reduction
-    ]))
-    story.append(tot_tbl)
-    story.append(Spacer(1, 2))  # Aggressively reduced to 2
-
-    story.append(Paragraph(f"In Words : ( {rupees_in_words(net)} )", BODY_STYLE))
-    story.append(Spacer(1, 2))  # Aggressively reduced to 2 to prevent overlap
+    tot_tbl.setStyle(TOTALS_TABLE_STYLE)
+    story.extend((
+        tot_tbl,
+        Spacer(1, 2),  # Aggressively reduced to 2
+        Paragraph(f"In Words : ( {rupees_in_words(net)} )", BODY_STYLE),
+        Spacer(1, 2),  # Aggressively reduced to 2 to prevent overlap
+    ))
 
     # Signature is now added via onFirstPage callback (removed from story flow)
     # This ensures it appears on page 1 at bottom left regardless of content flow
@@ -989,45 +1351,48 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     # Supporting documents page(s)
     if supporting_df is not None and not supporting_df.empty:
         try:
-            df = supporting_df.fillna("").astype(str)
-            story.append(PageBreak())
-            story.append(Paragraph("Supporting Documents / Excel data", TITLE_STYLE))
-            story.append(Spacer(1,6))
+            # Collapse whitespace/newlines in every cell column-wise, once for the whole sheet
+            df = supporting_df.fillna("").astype(str).apply(lambda s: s.str.split().str.join(" "))
+            story.extend((PageBreak(), Paragraph("Supporting Documents / Excel data", TITLE_STYLE), Spacer(1,6)))
 
             cols = list(df.columns)
             max_cols = 10
             for start in range(0, len(cols), max_cols):
                 subset_cols = cols[start:start+max_cols]
                 sub_df = df[subset_cols]
-                header_row = [Paragraph(str(c), ParagraphStyle('sh', fontName=FONT_NAME, fontSize=9, leading=10, alignment=1)) for c in sub_df.columns]
-                table_rows = [header_row]
-                for _, row in sub_df.iterrows():
-                    row_cells = []
-                    for c in sub_df.columns:
-                        txt = " ".join(str(row[c]).split())
-                        row_cells.append(Paragraph(txt, ParagraphStyle('cell', fontName=FONT_NAME, fontSize=7, leading=8)))
-                    table_rows.append(row_cells)
                 colw = [page_width / len(subset_cols) for _ in subset_cols]
-                sup_tbl = Table(table_rows, colWidths=colw, repeatRows=1)
-                sup_tbl.setStyle(TableStyle([
-                    ('GRID',(0,0),(-1,-1),0.25,colors.grey),
-                    ('BACKGROUND',(0,0),(-1,0),colors.whitesmoke),
-                    ('VALIGN',(0,0),(-1,-1),'TOP'),
-                    ('LEFTPADDING',(0,0),(-1,-1),2),
-                    ('RIGHTPADDING',(0,0),(-1,-1),2),
-                ]))
-                story.append(sup_tbl)
-                story.append(Spacer(1,8))
+                # Cells that fit on one line are drawn as plain strings; only longer text needs a Paragraph
+                fit_w = colw[0] - 4  # minus LEFT/RIGHTPADDING
+                def sup_cell(txt):
+                    if stringWidth(txt, FONT_NAME, SUPPORTING_CELL_STYLE.fontSize) <= fit_w:
+                        return txt
+                    return Paragraph(txt, SUPPORTING_CELL_STYLE)
+                # Long sheets go in as consecutive tables of SUPPORTING_ROWS_PER_TABLE rows: ReportLab
+                # re-splits a table on every page break, so one huge table costs O(rows^2) to lay out.
+                # Only the first chunk has the header row; on_later_page repeats it on continuation pages.
+                page_header = Table([[Paragraph(str(c), SUPPORTING_HEADER_STYLE) for c in subset_cols]], colWidths=colw)
+                page_header.setStyle(SUPPORTING_TABLE_STYLE)
+                for row_start in range(0, max(len(sub_df), 1), SUPPORTING_ROWS_PER_TABLE):
+                    chunk = sub_df.iloc[row_start:row_start+SUPPORTING_ROWS_PER_TABLE]
+                    table_rows = [[sup_cell(txt) for txt in row] for row in chunk.itertuples(index=False, name=None)]
+                    if row_start == 0:
+                        table_rows.insert(0, [Paragraph(str(c), SUPPORTING_HEADER_STYLE) for c in subset_cols])
+                        # Keep the header with at least one row, so the marker lands on the page the slice starts on
+                        head_h = Table(table_rows[:2], colWidths=colw, style=SUPPORTING_TABLE_STYLE).wrap(page_width, A4[1])[1]
+                        story.extend((CondPageBreak(head_h), SupportingHeaderMark(sup_header, page_header)))
+                    sup_tbl = Table(table_rows, colWidths=colw)
+                    sup_tbl.setStyle(SUPPORTING_TABLE_STYLE if row_start == 0 else SUPPORTING_BODY_STYLE)
+                    story.append(sup_tbl)
+                story.extend((SupportingHeaderMark(sup_header, None), Spacer(1,8)))
 
             # stamp on last supporting page bottom-right if signature exists
-            if COMPANY.get('signature') and os.path.exists(COMPANY.get('signature')):
-                try:
-                    stamp = Image(COMPANY['signature'], width=44.6*mm, height=31.3*mm)
+            try:
+                stamp = asset_image(COMPANY.get('signature'), width=44.6*mm, height=31.3*mm)
+                if stamp:
                     stamp.hAlign = 'RIGHT'
-                    story.append(Spacer(1,8))
-                    story.append(stamp)
-                except Exception:
-                    pass
+                    story.extend((Spacer(1,8), stamp))
+            except Exception:
+                pass
 
         except Exception as e:
             story.append(Paragraph("Error rendering supporting sheet: " + str(e), BODY_STYLE))
@@ -1035,6 +1400,61 @@ def generate_invoice_pdf(invoice_meta, line_items, supporting_df=None):
     doc.build(story)
     return path
 
+@st.cache_resource
+def get_pdf_executor():
+    """Worker pool for PDF builds - cached so it survives Streamlit reruns"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="invoice-pdf")
+
+def bulk_generate_invoices(metas, items_list, supporting_list=None, show_progress=True):
+    """
+    Generate several invoice PDFs on the shared PDF worker pool.
+    metas / items_list / supporting_list are parallel lists (supporting_list may be None).
+    Returns a list of (pdf_path, error) in input order; one failed invoice doesn't stop the rest.
+    """
+    total = len(metas)
+    supporting_list = supporting_list or [None] * total
+    results = [None] * total
+    progress = st.progress(0) if (show_progress and total > 0) else None
+    ex = get_pdf_executor()
+    futures = {ex.submit(generate_invoice_pdf, meta, copy.deepcopy(items), sup): i
+               for i, (meta, items, sup) in enumerate(zip(metas, items_list, supporting_list))}
+    # Progress is updated here on the script thread as PDFs finish
+    for done, fut in enumerate(as_completed(futures), start=1):
+        try:
+            results[futures[fut]] = (fut.result(), None)
+        except Exception as e:
+            results[futures[fut]] = (None, str(e))
+        if progress:
+            progress.progress(int(done/total*100))
+    if progress:
+        progress.empty()
+    return results
+
+# ---------------- Upload parsing ----------------
+# Cached on the file bytes: the uploader keeps its file across reruns, so without this every
+# widget click would re-parse the sheet (openpyxl is slow). Copies are returned, so callers may mutate.
+# Excel files use python-calamine when it is installed (Rust reader, several times faster);
+# otherwise pandas' default openpyxl reader, which already opens workbooks read-only.
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else None
+
+def read_excel_bytes(data, **kwargs):
+    return pd.read_excel(io.BytesIO(data), engine=EXCEL_ENGINE, **kwargs)
+
+@st.cache_data(max_entries=8, ttl="30m", show_spinner=False)
+def parse_client_upload(name, data):
+    """Parse a bulk client CSV/XLSX upload into a DataFrame of strings"""
+    if name.lower().endswith(".csv"):
+        return pd.read_csv(io.BytesIO(data), dtype=str, engine="c", na_filter=False)
+    return read_excel_bytes(data, dtype=str)
+
+@st.cache_data(max_entries=8, ttl="30m", show_spinner=False)
+def parse_supporting(name, data, nrows=None):
+    """Parse the supporting CSV/XLSX sheet attached to an invoice (only the first nrows rows if given)"""
+    if name.lower().endswith(".csv"):
+        # Read as plain strings - the PDF renders every cell as text anyway
+        return pd.read_csv(io.BytesIO(data), dtype=str, engine="c", na_filter=False, nrows=nrows)
+    return read_excel_bytes(data, nrows=nrows)
+
 # ---------------- Bulk helpers (unchanged logic) ----------------
 def normalize_uploaded_df(df):
     df = df.copy()
@@ -1055,60 +1475,141 @@ def normalize_uploaded_df(df):
             mapping['pan'] = lower[expected]; break
     if 'gstin' not in mapping:
         mapping['gstin'] = df.columns[0] if len(df.columns)>0 else None
-    out = []
-    for _, row in df.iterrows():
-        gstin_val = row.get(mapping.get('gstin')) if mapping.get('gstin') else ''
-        name_val = row.get(mapping.get('name')) if mapping.get('name') else ''
-        address_val = row.get(mapping.get('address')) if mapping.get('address') else ''
-        pan_val = row.get(mapping.get('pan')) if mapping.get('pan') else ''
-        out.append({"gstin": str(gstin_val).strip(), "name": str(name_val).strip(), "address": str(address_val).strip(), "pan": str(pan_val).strip()})
-    return pd.DataFrame(out)
+    # Column-wise: pick the mapped columns, blank out missing cells, strip whitespace
+    out = pd.DataFrame(index=df.index)
+    for field in ("gstin", "name", "address", "pan"):
+        col = mapping.get(field)
+        out[field] = df[col].fillna("").astype(str).str.strip() if col else ""
+    return out.reset_index(drop=True)
+
+def _verify_row(row, verify_with_api, throttle=None, payload=None, db_cache=True, key=None, session=None):
+    """
+    Verify one normalized upload row. Returns (result dict for the bulk results table,
+    raw Appyflow payload or None) - the payload lets bulk verify store new lookups in one batch.
+    """
+    gstin = str(row.get('gstin','')).strip()
+    given_name = row.get('name','') or ""
+    given_addr = row.get('address','') or ""
+    given_pan = row.get('pan','') or ""
+    res_name, res_addr, res_pan, res_state = given_name, given_addr, given_pan, ""
+    status = "Manual"; error = ""; raw = None
+    if not gstin:
+        status = "Failed"; error = "Empty GSTIN"
+    else:
+        if verify_with_api:
+            api_res = fetch_gst_from_appyflow(gstin, throttle=throttle, payload=payload, db_cache=db_cache,
+                                              key=key, session=session)
+            if api_res.get("ok"):
+                raw = api_res.get("raw")
+                res_name = api_res.get("name") or given_name
+                res_addr = api_res.get("address") or given_addr
+                res_pan = api_res.get("pan") or given_pan
+                res_state = api_res.get("state_code") or gst_state_code(gstin)
+                status = "OK"
+            else:
+                status = "Failed"; error = api_res.get("error","API failed")
+        else:
+            res_state = gst_state_code(gstin)
+            status = "OK"
+    return {"gstin": gstin, "name": res_name, "address": res_addr, "pan": res_pan, "state": res_state, "status": status, "error": error}, raw
+
+def _min_interval_throttle(interval):
+    """Callable that blocks so successive calls (from any thread) start at least `interval` seconds apart"""
+    lock = threading.Lock()
+    next_slot = [0.0]
+    def wait():
+        with lock:
+            now = time.monotonic()
+            slot = max(now, next_slot[0])
+            next_slot[0] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+    return wait
+
+def _prepare_without_api(df):
+    """verify_with_api=False path of bulk_verify_and_prepare, computed column-wise (no per-row Python)"""
+    def col(name):
+        return df[name].fillna("").astype(str) if name in df.columns else pd.Series("", index=df.index)
+    gstin = col('gstin').str.strip()
+    prefix = gstin.str[:2]
+    has_gstin = gstin != ""
+    out = pd.DataFrame({
+        "gstin": gstin,
+        "name": col('name'),
+        "address": col('address'),
+        "pan": col('pan'),
+        "state": prefix.where(prefix.str.fullmatch(r"\d\d"), ""),  # same rule as gst_state_code
+        "status": has_gstin.map({True: "OK", False: "Failed"}),
+        "error": (~has_gstin).map({True: "Empty GSTIN", False: ""}),
+    })
+    return out.reset_index(drop=True)
 
 def bulk_verify_and_prepare(df, verify_with_api=True, delay_between_calls=0.2, show_progress=True):
-    results = []
-    total = len(df)
+    """
+    Verify every row of a normalized upload. API lookups run on GST_VERIFY_WORKERS threads;
+    delay_between_calls is the minimum spacing between Appyflow requests (rate limit), not a
+    per-row sleep; GSTINs already in the lookup cache (or gst_cache table) don't wait. Results keep the upload's row order.
+    """
+    if not verify_with_api:
+        return _prepare_without_api(df)
+    rows = df.to_dict('records')
+    total = len(rows)
     progress = None
     if show_progress and total>0:
         progress = st.progress(0)
-    for i, row in df.iterrows():
-        gstin = str(row.get('gstin','')).strip()
-        given_name = row.get('name','') or ""
-        given_addr = row.get('address','') or ""
-        given_pan = row.get('pan','') or ""
-        res_name, res_addr, res_pan, res_state = given_name, given_addr, given_pan, ""
-        status = "Manual"; error = ""
-        if not gstin:
-            status = "Failed"; error = "Empty GSTIN"
-        else:
-            if verify_with_api:
-                api_res = fetch_gst_from_appyflow(gstin)
-                if api_res.get("ok"):
-                    res_name = api_res.get("name") or given_name
-                    res_addr = api_res.get("address") or given_addr
-                    res_pan = api_res.get("pan") or given_pan
-                    res_state = api_res.get("state_code") or gst_state_code(gstin)
-                    status = "OK"
-                else:
-                    status = "Failed"; error = api_res.get("error","API failed")
-            else:
-                res_state = gst_state_code(gstin)
-                status = "OK"
-        results.append({"gstin": gstin, "name": res_name, "address": res_addr, "pan": res_pan, "state": res_state, "status": status, "error": error})
-        if show_progress:
-            progress.progress(int((i+1)/total*100))
-        if verify_with_api:
-            time.sleep(delay_between_calls)
-    if show_progress:
+    results = [None] * total
+    if total > 1:
+        throttle = _min_interval_throttle(delay_between_calls) if delay_between_calls else None
+        # The workers never touch MySQL: gst_cache is read here in one batch before the fan-out
+        # (misses go straight to the API) and new payloads are written back in one upsert after it
+        keys = [str(row.get('gstin','')).strip().upper() for row in rows]
+        known = _gst_cache_get_many(keys)
+        # The API key and HTTP session are st.cache_resource values: resolve them here, since the worker
+        # threads have no ScriptRunContext and Streamlit warns on every such call from them
+        api_key = appyflow_key() or ""
+        session = gst_http_session()
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=min(GST_VERIFY_WORKERS, total), thread_name_prefix="gst-verify") as ex:
+            futures = {ex.submit(_verify_row, row, True, throttle, known.get(key), False, api_key, session): i
+                       for i, (row, key) in enumerate(zip(rows, keys))}
+            # Progress is updated here on the script thread as lookups finish
+            for done, fut in enumerate(as_completed(futures), start=1):
+                i = futures[fut]
+                results[i], raw = fut.result()
+                if raw is not None and keys[i] not in known:
+                    fetched[keys[i]] = raw
+                if progress:
+                    progress.progress(int(done/total*100))
+        if fetched:
+            _gst_cache_put_many(fetched)
+    else:
+        for i, row in enumerate(rows):
+            results[i], _ = _verify_row(row, True)
+            if progress:
+                progress.progress(int((i+1)/total*100))
+    if progress:
         progress.empty()
     return pd.DataFrame(results)
 
 def add_successful_results_to_db(results_df, only_status="OK"):
     added = 0; failed = []
-    for _, r in results_df.iterrows():
-        if r.get('status') == only_status:
-            ok, err = add_client(r.get('name') or "", r.get('gstin') or "", r.get('pan') or "", r.get('address') or "", email="", purchase_order="", state_code=r.get('state') or "")
-            if ok: added += 1
-            else: failed.append({"gstin": r.get('gstin'), "error": err})
+    if results_df is None or results_df.empty or 'status' not in results_df.columns:
+        return added, failed
+    # Filter with a column mask and build the upsert tuples column-wise instead of iterrows()
+    ok_df = results_df.loc[results_df['status'] == only_status, ['name', 'gstin', 'pan', 'address', 'state']]
+    ok_df = ok_df.astype(object).where(ok_df.notna(), "")
+    rows = [(name or "", gstin or "", pan or "", address or "", "", "", state or "") + ("",) * 10
+            for name, gstin, pan, address, state in ok_df.itertuples(index=False, name=None)]
+    if not rows:
+        return added, failed
+    # One transaction for the whole batch; only if it fails, retry row by row to report which GSTINs are bad
+    ok, err = add_clients_bulk(rows)
+    if ok:
+        return len(rows), failed
+    for row in rows:
+        ok, err = add_client(*row)
+        if ok: added += 1
+        else: failed.append({"gstin": row[1], "error": err})
     return added, failed
 
 # ---------------- Auth ----------------
@@ -1150,13 +1651,427 @@ def check_password():
             return False
     return False
 
+# ---------------- Line item callbacks ----------------
+# Run by Streamlit before the next script pass, so a click costs a single rerun.
+def _add_row():
+    rows = st.session_state.rows
+    rows.append({"slno": len(rows)+1, "particulars":"", "description":"", "sac_code":"", "qty":"", "rate":""})
+
+# ---------------- Line items editor (fragment) ----------------
+@st.fragment
+def render_line_items(client_key, preview_meta):
+    """
+    Line-item table, IGST/advance inputs, live preview and subtotal.
+    Runs as a fragment: row edits rerun only this block, not the DB queries and uploads around it.
+    client_key is the selected client id (0 if none) and keeps widget keys unique per client.
+    Returns (force_igst, advance_received, subtotal_calc) for the Generate PDF step on full runs.
+    """
+    # Add CSS for table borders with perfectly aligned column lines
+    st.markdown(
+        """
+        <style>
+        .table-wrapper {
+            border: 2px solid #4a90e2;
+            border-radius: 4px;
+            overflow: hidden;
+            margin-bottom: 10px;
+        }
+        /* Remove ALL gaps between Streamlit columns */
+        .table-wrapper div[data-testid="column"] {
+            padding: 0 !important;
+            margin: 0 !important;
+            gap: 0 !important;
+        }
+        /* Remove gaps in the row container */
+        .table-wrapper > div[data-testid="column-container"],
+        .table-wrapper [data-testid="column-container"],
+        .table-wrapper .row-widget.stHorizontal {
+            gap: 0 !important;
+            margin: 0 !important;
+            padding: 0 !important;
+        }
+        /* Remove Streamlit's default column spacing */
+        .table-wrapper [class*="stHorizontal"] {
+            gap: 0 !important;
+        }
+        /* Header row styling */
+        .table-header-row {
+            background: #f0f7ff;
+            border-top: 2px solid #4a90e2;
+            border-bottom: 2px solid #4a90e2;
+            position: relative;
+        }
+        /* Apply column borders to header row - must be visible */
+        .table-header-row div[data-testid="column"]:not(:last-child) {
+            border-right: 1px solid #4a90e2 !important;
+            position: relative;
+        }
+        .table-header-cell {
+            padding: 10px 8px;
+            font-weight: 600;
+            color: #2c3e50;
+            text-align: center;
+        }
+        /* Data row styling */
+        .table-data-row {
+            border-left: 2px solid #4a90e2;
+            border-right: 2px solid #4a90e2;
+            border-bottom: 1px solid #4a90e2;
+            margin: 0 !important;
+            padding: 0 !important;
+            line-height: 0.8 !important;
+            position: relative;
+        }
+        /* Apply column borders to data rows - must be visible */
+        .table-data-row div[data-testid="column"]:not(:last-child) {
+            border-right: 1px solid #4a90e2 !important;
+            position: relative;
+        }
+        .table-data-row:last-child {
+            border-bottom: 2px solid #4a90e2;
+        }
+        /* Use pseudo-elements to extend column borders to touch top and bottom row borders */
+        .table-header-row div[data-testid="column"]:not(:last-child)::after {
+            content: '';
+            position: absolute;
+            top: -2px;
+            right: -1px;
+            bottom: 0;
+            width: 1px;
+            background-color: #4a90e2;
+            z-index: 100;
+            pointer-events: none;
+        }
+        .table-data-row div[data-testid="column"]:not(:last-child)::after {
+            content: '';
+            position: absolute;
+            top: 0;
+            right: -1px;
+            bottom: 0;
+            width: 1px;
+            background-color: #4a90e2;
+            z-index: 100;
+            pointer-events: none;
+        }
+        /* For last data row, extend border to bottom */
+        .table-data-row:last-child div[data-testid="column"]:not(:last-child)::after {
+            bottom: -2px;
+        }
+        /* Also ensure border-right is visible on all columns with maximum specificity */
+        .table-wrapper .table-header-row div[data-testid="column"]:not(:last-child),
+        .table-wrapper .table-data-row div[data-testid="column"]:not(:last-child),
+        .table-wrapper div[data-testid="column-container"] div[data-testid="column"]:not(:last-child) {
+            border-right: 1px solid #4a90e2 !important;
+            border-right-width: 1px !important;
+            border-right-style: solid !important;
+            border-right-color: #4a90e2 !important;
+        }
+        /* Force column borders to be visible - override any Streamlit defaults */
+        .table-wrapper div[data-testid="column"]:not(:last-child) {
+            border-right: 1px solid #4a90e2 !important;
+        }
+        .table-data-cell {
+            padding: 0px 2px !important;
+            min-height: 25px !important;
+            position: relative;
+        }
+        /* Remove ALL spacing between row containers */
+        .table-wrapper > div[data-testid="column-container"] {
+            margin-bottom: 0 !important;
+            padding-bottom: 0 !important;
+            margin-top: 0 !important;
+            padding-top: 0 !important;
+        }
+        /* Reduce spacing in Streamlit elements */
+        .table-data-row .element-container {
+            margin-bottom: 0 !important;
+            padding-bottom: 0 !important;
+            margin-top: 0 !important;
+            padding-top: 0 !important;
+        }
+        .table-data-row .stTextInput,
+        .table-data-row .stNumberInput {
+            margin-bottom: 0 !important;
+            margin-top: 0 !important;
+        }
+        .table-data-row .stTextInput > div,
+        .table-data-row .stNumberInput > div {
+            margin-bottom: 0 !important;
+            margin-top: 0 !important;
+            padding-bottom: 0 !important;
+            padding-top: 0 !important;
+        }
+        /* Remove spacing from markdown elements */
+        .table-data-row .stMarkdown {
+            margin-bottom: 0 !important;
+            margin-top: 0 !important;
+            padding-bottom: 0 !important;
+            padding-top: 0 !important;
+        }
+        /* Remove any gap between rows */
+        .table-data-row + .table-data-row {
+            margin-top: 0 !important;
+        }
+        /* Aggressively remove all spacing from nested elements in rows */
+        .table-data-row * {
+            margin-top: 0 !important;
+            margin-bottom: 0 !important;
+            padding-top: 0 !important;
+            padding-bottom: 0 !important;
+        }
+        /* Reduce input field heights and padding */
+        .table-data-row .stTextInput > div > div > input,
+        .table-data-row .stNumberInput > div > div > input {
+            padding: 2px 4px !important;
+            line-height: 1.2 !important;
+            min-height: 24px !important;
+        }
+        /* Reduce spacing in all Streamlit widgets within rows */
+        .table-data-row [class*="stTextInput"],
+        .table-data-row [class*="stNumberInput"],
+        .table-data-row [class*="stMarkdown"] {
+            margin: 0 !important;
+            padding: 0 !important;
+        }
+        /* Remove any gap between consecutive row containers */
+        .table-wrapper > div[data-testid="column-container"] + div[data-testid="column-container"] {
+            margin-top: -1px !important;
+        }
+        /* Label styling for Qty and Rate - positioned absolutely above input */
+        .table-data-cell-label {
+            position: absolute;
+            top: 2px;
+            left: 4px;
+            font-size: 11px;
+            font-weight: 500;
+            color: #2c3e50;
+            z-index: 2;
+            line-height: 1.2;
+            pointer-events: none;
+        }
+        /* Ensure inputs stay in same position - no padding added */
+        .table-data-cell-with-label .stTextInput > div > div > input {
+            position: relative;
+            z-index: 1;
+        }
+        /* Ensure taxable text doesn't interfere with label */
+        .table-data-cell-with-label .stMarkdown {
+            margin-top: 0 !important;
+            margin-bottom: 0 !important;
+            padding-top: 16px !important;
+        }
+        /* Ensure proper spacing and alignment */
+        .stNumberInput > div > div > input,
+        .stTextInput > div > div > input {
+            border: none !important;
+            box-shadow: none !important;
+            padding: 2px 4px !important;
+            line-height: 1.2 !important;
+        }
+        /* Force exact width matching */
+        .table-wrapper div[data-testid="column"] {
+            box-sizing: border-box !important;
+        }
+        /* Remove any default Streamlit spacing */
+        .table-wrapper .element-container {
+            margin: 0 !important;
+            padding: 0 !important;
+        }
+        /* Remove spacing from markdown containers that wrap rows */
+        .table-wrapper div[data-testid="stMarkdownContainer"] {
+            margin: 0 !important;
+            padding: 0 !important;
+        }
+        </style>
+        <script>
+        // Force column borders to appear using JavaScript
+        function addColumnBorders() {
+            const wrapper = document.querySelector('.table-wrapper');
+            if (wrapper) {
+                const columns = wrapper.querySelectorAll('div[data-testid="column"]:not(:last-child)');
+                columns.forEach(col => {
+                    col.style.setProperty('border-right', '1px solid #4a90e2', 'important');
+                    col.style.setProperty('border-right-width', '1px', 'important');
+                    col.style.setProperty('border-right-style', 'solid', 'important');
+                    col.style.setProperty('border-right-color', '#4a90e2', 'important');
+                });
+            }
+        }
+        // Run immediately and on DOM changes
+        addColumnBorders();
+        setTimeout(addColumnBorders, 100);
+        setTimeout(addColumnBorders, 500);
+        const observer = new MutationObserver(addColumnBorders);
+        observer.observe(document.body, { childList: true, subtree: true });
+        </script>
+        """,
+        unsafe_allow_html=True,
+    )
+    
+    # Display table with borders - Header using Streamlit columns for perfect alignment
+    st.markdown('<div class="table-wrapper">', unsafe_allow_html=True)
+    st.markdown('<div class="table-header-row">', unsafe_allow_html=True)
+    
+    # Use the same column proportions as data rows
+    h1, h2, h3, h4, h5, h6, h7 = st.columns([0.8, 2.5, 3.5, 1.2, 1.0, 1.0, 1.5])
+    
+    with h1:
+        st.markdown('<div class="table-header-cell">S.No</div>', unsafe_allow_html=True)
+    with h2:
+        st.markdown('<div class="table-header-cell" style="text-align:left;">Particulars</div>', unsafe_allow_html=True)
+    with h3:
+        st.markdown('<div class="table-header-cell" style="text-align:left;">Description</div>', unsafe_allow_html=True)
+    with h4:
+        st.markdown('<div class="table-header-cell">SAC</div>', unsafe_allow_html=True)
+    with h5:
+        st.markdown('<div class="table-header-cell">Qty</div>', unsafe_allow_html=True)
+    with h6:
+        st.markdown('<div class="table-header-cell">Rate</div>', unsafe_allow_html=True)
+    with h7:
+        st.markdown('<div class="table-header-cell">Taxable</div>', unsafe_allow_html=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    
+    # Subtotal is summed from the same Taxable values shown per row (and parsed the same way as the PDF)
+    subtotal_calc = 0.0
+    for idx in range(len(st.session_state.rows)):
+        r = st.session_state.rows[idx]
+        # Create a row container
+        st.markdown('<div class="table-data-row">', unsafe_allow_html=True)
+        
+        # Use columns for the inputs
+        c1, c2, c3, c4, c5, c6, c7 = st.columns([0.8, 2.5, 3.5, 1.2, 1.0, 1.0, 1.5])
+        
+        with c1:
+            st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
+            new_sl = st.number_input("S.No", value=int(r.get('slno', idx+1)), min_value=1, step=1, key=f"sl_{client_key}_{idx}", label_visibility="collapsed")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        with c2:
+            st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
+            new_part = st.text_input("Particulars", value=r.get('particulars', ''), key=f"part_{client_key}_{idx}", label_visibility="collapsed")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        with c3:
+            st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
+            new_desc = st.text_input("Description", value=r.get('description', ''), key=f"desc_{client_key}_{idx}", label_visibility="collapsed")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        with c4:
+            st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
+            new_sac = st.text_input("SAC", value=r.get('sac_code', ''), key=f"sac_{client_key}_{idx}", label_visibility="collapsed")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        with c5:
+            st.markdown('<div class="table-data-cell table-data-cell-with-label"><div class="table-data-cell-label">Qty</div>', unsafe_allow_html=True)
+            new_qty = st.text_input("Qty", value=str(r.get('qty', '')), key=f"qty_{client_key}_{idx}", label_visibility="collapsed")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        with c6:
+            st.markdown('<div class="table-data-cell table-data-cell-with-label"><div class="table-data-cell-label">Rate</div>', unsafe_allow_html=True)
+            new_rate = st.text_input("Rate", value=str(r.get('rate', '')), key=f"rate_{client_key}_{idx}", label_visibility="collapsed")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        with c7:
+            try:
+                qv = float(new_qty.replace(",", "")) if (new_qty and str(new_qty).strip() != "") else None
+            except:
+                qv = None
+            try:
+                rv = float(new_rate.replace(",", "")) if (new_rate and str(new_rate).strip() != "") else None
+            except:
+                rv = None
+            taxable_val = (qv * rv) if (qv is not None and rv is not None) else None
+            if taxable_val is not None:
+                subtotal_calc += taxable_val
+            st.markdown('<div class="table-data-cell table-data-cell-with-label"><div class="table-data-cell-label">Taxable</div>', unsafe_allow_html=True)
+            st.write(f"**Rs. {taxable_val:,.2f}**" if taxable_val is not None else "**-**")
+            st.markdown('</div>', unsafe_allow_html=True)
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Persist updates back to session_state - only rows whose values actually changed
+        new_vals = {
+            "slno": new_sl,
+            "particulars": new_part,
+            "description": new_desc,
+            "sac_code": new_sac,
+            "qty": new_qty,
+            "rate": new_rate,
+        }
+        if any(r.get(k) != v for k, v in new_vals.items()):
+            r.update(new_vals)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    st.button("Add New Row (Bottom)", on_click=_add_row)
+
+    # Add CSS to make checkbox bold and visible
+    st.markdown(
+        """
+        <style>
+        /* Make Force IGST checkbox bold and visible */
+        div[data-testid="stCheckbox"] label {
+            font-weight: 700 !important;
+            font-size: 20px !important;
+            color: #1f2937 !important;
+        }
+        div[data-testid="stCheckbox"] label p {
+            font-weight: 700 !important;
+            font-size: 20px !important;
+            color: #1f2937 !important;
+            margin: 0 !important;
+        }
+        div[data-testid="stCheckbox"] {
+            margin-bottom: 8px !important;
+        }
+        /* Increase checkbox box size */
+        div[data-testid="stCheckbox"] input[type="checkbox"] {
+            width: 24px !important;
+            height: 24px !important;
+            min-width: 24px !important;
+            min-height: 24px !important;
+            margin-right: 12px !important;
+        }
+        div[data-testid="stCheckbox"] label {
+            padding: 8px 0 !important;
+            line-height: 1.5 !important;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+    force_igst = st.checkbox("Force IGST manually", value=False)
+    advance_received = st.number_input("Advance Received (if any)", min_value=0.0, value=0.0)
+
+    # Render on-screen preview that resembles the invoice layout
+    try:
+        render_invoice_preview(preview_meta, st.session_state.rows, subtotal_calc, force_igst, advance_received)
+    except Exception as e:
+        # If preview fails for any reason, still show subtotal
+        st.write("Preview unavailable")
+        st.error(f"Preview error: {str(e)}")
+
+    st.metric("Subtotal", f"Rs. {subtotal_calc:,.2f}")
+    return force_igst, advance_received, subtotal_calc
+
+
 # ---------------- Streamlit UI (rest of app same as before) ----------------
+@st.cache_resource
+def setup_database():
+    """Create/migrate the schema once per server process instead of on every rerun.
+    If init_db() or a migration raises, nothing is cached and the next rerun tries again."""
+    init_db()
+    migrate_db_add_columns()
+    migrate_db_add_indexes()
+    return True
+
 def main():
     st.set_page_config(page_title=APP_TITLE, layout="wide")
     st.title(APP_TITLE)
     st.caption(APP_BUILT_BY)
-    init_db()
-    migrate_db_add_columns()
+    setup_database()
 
     if not check_password():
         return
@@ -1166,10 +2081,9 @@ def main():
     # Manage Clients
     if mode == "Manage Clients":
         st.header("Manage Clients")
-        clients = get_clients()
-        if clients:
-            dfc = pd.DataFrame(clients, columns=['id','name','gstin','pan','address','email','purchase_order','state_code'])
-            st.dataframe(dfc[['name','gstin','state_code','purchase_order']])
+        dfc = get_clients_df()
+        if not dfc.empty:
+            st.dataframe(dfc)
 
         st.subheader("Add New Client")
         with st.form("add_client_form"):
@@ -1255,12 +2169,9 @@ def main():
         uploaded = st.file_uploader("Upload file", type=["csv","xlsx"])
         if uploaded:
             try:
-                if uploaded.name.lower().endswith(".csv"):
-                    df_raw = pd.read_csv(uploaded, dtype=str, keep_default_na=False)
-                else:
-                    df_raw = pd.read_excel(uploaded, dtype=str)
+                df_raw = parse_client_upload(uploaded.name, uploaded.getvalue())
                 st.success(f"Loaded {uploaded.name} rows:{len(df_raw)}")
-                st.dataframe(df_raw.head())
+                st.table(df_raw.head())  # small static preview - no interactive grid needed
                 st.session_state._bulk_df = normalize_uploaded_df(df_raw)
             except Exception as e:
                 st.error(f"Error reading file: {e}")
@@ -1269,7 +2180,7 @@ def main():
         bulk_df = st.session_state.get("_bulk_df")
         if bulk_df is not None:
             st.markdown("**Preview normalized**")
-            st.dataframe(bulk_df.head(20))
+            st.table(bulk_df.head(20))
             col1, col2 = st.columns(2)
             with col1:
                 verify_api = st.checkbox("Verify GST via API (appyflow)", value=True)
@@ -1292,15 +2203,7 @@ def main():
                 safe_rerun()
 
         st.subheader("Edit / Delete Client")
-        clients_list = get_clients()
-        def client_label(c):
-            cid, name, gstin, pan, addr, email, po, stc = c
-            # Use stored state_code if available, otherwise derive from GSTIN
-            state_code = stc or gst_state_code(gstin) if gstin else ""
-            stlbl = f"-{STATE_MAP.get(state_code, state_code)}" if state_code else ""
-            po_part = f" | PO:{po}" if po else ""
-            return f"{name} | {gstin} {stlbl}{po_part}"
-        clients_map = {client_label(c): c[0] for c in clients_list}
+        clients_map = get_client_options(with_po=True)
         sel = st.selectbox("Select client", options=["--select--"] + list(clients_map.keys()))
         if sel != "--select--":
             cid = clients_map[sel]
@@ -1417,31 +2320,20 @@ def main():
     elif mode == "Create Invoice":
         st.header("Create Invoice")
         clients = get_clients()
-        client_options = []
-        for c in clients:
-            cid, name, gstin, pan, addr, email, po, stc = c
-            # Use stored state_code if available, otherwise derive from GSTIN
-            state_code = stc or gst_state_code(gstin) if gstin else ""
-            stlbl = f"-{STATE_MAP.get(state_code, state_code)}" if state_code else ""
-            client_options.append((f"{name} | {gstin} {stlbl}", cid))
-        client_select = ["--select--"] + [lbl for lbl,_ in client_options]
-        selected = st.selectbox("Select Client", options=client_select)
+        clients_by_id = {c[0]: c for c in clients}
+        client_options = get_client_options()
+        selected = st.selectbox("Select Client", options=["--select--"] + list(client_options))
         client_info = None
         current_client_id = None
         if selected != "--select--":
-            cid = None
-            for lbl, idv in client_options:
-                if lbl == selected:
-                    cid = idv; break
+            cid = client_options.get(selected)
             if cid:
                 current_client_id = cid
-                rec = get_client_by_id(cid)
+                # The dropdown query already has every header field; the full record (line-item
+                # defaults) is only fetched below when the selected client changes
+                rec = clients_by_id.get(cid)
                 if rec:
-                    # Unpack all 18 values from the record
-                    (cid, name, gstin, pan, address, email, purchase_order, state_code,
-                     graduate_qty, graduate_rate, undergraduate_qty, undergraduate_rate,
-                     candidates_qty, candidates_rate, exam_fee_qty, exam_fee_rate,
-                     handbooks_qty, handbooks_rate) = rec
+                    cid, name, gstin, pan, address, email, purchase_order, state_code = rec
                     client_info = {"id": cid, "name": name, "gstin": gstin, "pan": pan, "address": address, "purchase_order": purchase_order, "state_code": state_code}
 
         # Track the last selected client ID and reset rows when client changes
@@ -1480,9 +2372,6 @@ def main():
                     {"slno":4, "particulars":"EXAM FEE", "description":"Commercial Training and Coaching Services", "sac_code":"999293", "qty":"", "rate":""},
                     {"slno":5, "particulars":"HAND BOOKS", "description":"Commercial Training and Coaching Services", "sac_code":"999293", "qty":"", "rate":""}
                 ]
-            # Also clear supporting dataframe when client changes
-            if "supporting_df" in st.session_state:
-                st.session_state.supporting_df = None
             st.session_state.last_selected_client_id = current_client_id
             safe_rerun()  # Force rerun to update the UI with reset values
         elif current_client_id is None:
@@ -1508,397 +2397,6 @@ def main():
                 {"slno":5, "particulars":"HAND BOOKS", "description":"Commercial Training and Coaching Services", "sac_code":"999293", "qty":"", "rate":""}
             ]
 
-        # Add CSS for table borders with perfectly aligned column lines
-        st.markdown(
-            """
-            <style>
-            .table-wrapper {
-                border: 2px solid #4a90e2;
-                border-radius: 4px;
-                overflow: hidden;
-                margin-bottom: 10px;
-            }
-            /* Remove ALL gaps between Streamlit columns */
-            .table-wrapper div[data-testid="column"] {
-                padding: 0 !important;
-                margin: 0 !important;
-                gap: 0 !important;
-            }
-            /* Remove gaps in the row container */
-            .table-wrapper > div[data-testid="column-container"],
-            .table-wrapper [data-testid="column-container"],
-            .table-wrapper .row-widget.stHorizontal {
-                gap: 0 !important;
-                margin: 0 !important;
-                padding: 0 !important;
-            }
-            /* Remove Streamlit's default column spacing */
-            .table-wrapper [class*="stHorizontal"] {
-                gap: 0 !important;
-            }
-            /* Header row styling */
-            .table-header-row {
-                background: #f0f7ff;
-                border-top: 2px solid #4a90e2;
-                border-bottom: 2px solid #4a90e2;
-                position: relative;
-            }
-            /* Apply column borders to header row - must be visible */
-            .table-header-row div[data-testid="column"]:not(:last-child) {
-                border-right: 1px solid #4a90e2 !important;
-                position: relative;
-            }
-            .table-header-cell {
-                padding: 10px 8px;
-                font-weight: 600;
-                color: #2c3e50;
-                text-align: center;
-            }
-            /* Data row styling */
-            .table-data-row {
-                border-left: 2px solid #4a90e2;
-                border-right: 2px solid #4a90e2;
-                border-bottom: 1px solid #4a90e2;
-                margin: 0 !important;
-                padding: 0 !important;
-                line-height: 0.8 !important;
-                position: relative;
-            }
-            /* Apply column borders to data rows - must be visible */
-            .table-data-row div[data-testid="column"]:not(:last-child) {
-                border-right: 1px solid #4a90e2 !important;
-                position: relative;
-            }
-            .table-data-row:last-child {
-                border-bottom: 2px solid #4a90e2;
-            }
-            /* Use pseudo-elements to extend column borders to touch top and bottom row borders */
-            .table-header-row div[data-testid="column"]:not(:last-child)::after {
-                content: '';
-                position: absolute;
-                top: -2px;
-                right: -1px;
-                bottom: 0;
-                width: 1px;
-                background-color: #4a90e2;
-                z-index: 100;
-                pointer-events: none;
-            }
-            .table-data-row div[data-testid="column"]:not(:last-child)::after {
-                content: '';
-                position: absolute;
-                top: 0;
-                right: -1px;
-                bottom: 0;
-                width: 1px;
-                background-color: #4a90e2;
-                z-index: 100;
-                pointer-events: none;
-            }
-            /* For last data row, extend border to bottom */
-            .table-data-row:last-child div[data-testid="column"]:not(:last-child)::after {
-                bottom: -2px;
-            }
-            /* Also ensure border-right is visible on all columns with maximum specificity */
-            .table-wrapper .table-header-row div[data-testid="column"]:not(:last-child),
-            .table-wrapper .table-data-row div[data-testid="column"]:not(:last-child),
-            .table-wrapper div[data-testid="column-container"] div[data-testid="column"]:not(:last-child) {
-                border-right: 1px solid #4a90e2 !important;
-                border-right-width: 1px !important;
-                border-right-style: solid !important;
-                border-right-color: #4a90e2 !important;
-            }
-            /* Force column borders to be visible - override any Streamlit defaults */
-            .table-wrapper div[data-testid="column"]:not(:last-child) {
-                border-right: 1px solid #4a90e2 !important;
-            }
-            .table-data-cell {
-                padding: 0px 2px !important;
-                min-height: 25px !important;
-                position: relative;
-            }
-            /* Remove ALL spacing between row containers */
-            .table-wrapper > div[data-testid="column-container"] {
-                margin-bottom: 0 !important;
-                padding-bottom: 0 !important;
-                margin-top: 0 !important;
-                padding-top: 0 !important;
-            }
-            /* Reduce spacing in Streamlit elements */
-            .table-data-row .element-container {
-                margin-bottom: 0 !important;
-                padding-bottom: 0 !important;
-                margin-top: 0 !important;
-                padding-top: 0 !important;
-            }
-            .table-data-row .stTextInput,
-            .table-data-row .stNumberInput {
-                margin-bottom: 0 !important;
-                margin-top: 0 !important;
-            }
-            .table-data-row .stTextInput > div,
-            .table-data-row .stNumberInput > div {
-                margin-bottom: 0 !important;
-                margin-top: 0 !important;
-                padding-bottom: 0 !important;
-                padding-top: 0 !important;
-            }
-            /* Remove spacing from markdown elements */
-            .table-data-row .stMarkdown {
-                margin-bottom: 0 !important;
-                margin-top: 0 !important;
-                padding-bottom: 0 !important;
-                padding-top: 0 !important;
-            }
-            /* Remove any gap between rows */
-            .table-data-row + .table-data-row {
-                margin-top: 0 !important;
-            }
-            /* Aggressively remove all spacing from nested elements in rows */
-            .table-data-row * {
-                margin-top: 0 !important;
-                margin-bottom: 0 !important;
-                padding-top: 0 !important;
-                padding-bottom: 0 !important;
-            }
-            /* Reduce input field heights and padding */
-            .table-data-row .stTextInput > div > div > input,
-            .table-data-row .stNumberInput > div > div > input {
-                padding: 2px 4px !important;
-                line-height: 1.2 !important;
-                min-height: 24px !important;
-            }
-            /* Reduce spacing in all Streamlit widgets within rows */
-            .table-data-row [class*="stTextInput"],
-            .table-data-row [class*="stNumberInput"],
-            .table-data-row [class*="stMarkdown"] {
-                margin: 0 !important;
-                padding: 0 !important;
-            }
-            /* Remove any gap between consecutive row containers */
-            .table-wrapper > div[data-testid="column-container"] + div[data-testid="column-container"] {
-                margin-top: -1px !important;
-            }
-            /* Label styling for Qty and Rate - positioned absolutely above input */
-            .table-data-cell-label {
-                position: absolute;
-                top: 2px;
-                left: 4px;
-                font-size: 11px;
-                font-weight: 500;
-                color: #2c3e50;
-                z-index: 2;
-                line-height: 1.2;
-                pointer-events: none;
-            }
-            /* Ensure inputs stay in same position - no padding added */
-            .table-data-cell-with-label .stTextInput > div > div > input {
-                position: relative;
-                z-index: 1;
-            }
-            /* Ensure taxable text doesn't interfere with label */
-            .table-data-cell-with-label .stMarkdown {
-                margin-top: 0 !important;
-                margin-bottom: 0 !important;
-                padding-top: 16px !important;
-            }
-            /* Ensure proper spacing and alignment */
-            .stNumberInput > div > div > input,
-            .stTextInput > div > div > input {
-                border: none !important;
-                box-shadow: none !important;
-                padding: 2px 4px !important;
-                line-height: 1.2 !important;
-            }
-            /* Force exact width matching */
-            .table-wrapper div[data-testid="column"] {
-                box-sizing: border-box !important;
-            }
-            /* Remove any default Streamlit spacing */
-            .table-wrapper .element-container {
-                margin: 0 !important;
-                padding: 0 !important;
-            }
-            /* Remove spacing from markdown containers that wrap rows */
-            .table-wrapper div[data-testid="stMarkdownContainer"] {
-                margin: 0 !important;
-                padding: 0 !important;
-            }
-            </style>
-            <script>
-            // Force column borders to appear using JavaScript
-            function addColumnBorders() {
-                const wrapper = document.querySelector('.table-wrapper');
-                if (wrapper) {
-                    const columns = wrapper.querySelectorAll('div[data-testid="column"]:not(:last-child)');
-                    columns.forEach(col => {
-                        col.style.setProperty('border-right', '1px solid #4a90e2', 'important');
-                        col.style.setProperty('border-right-width', '1px', 'important');
-                        col.style.setProperty('border-right-style', 'solid', 'important');
-                        col.style.setProperty('border-right-color', '#4a90e2', 'important');
-                    });
-                }
-            }
-            // Run immediately and on DOM changes
-            addColumnBorders();
-            setTimeout(addColumnBorders, 100);
-            setTimeout(addColumnBorders, 500);
-            const observer = new MutationObserver(addColumnBorders);
-            observer.observe(document.body, { childList: true, subtree: true });
-            </script>
-            """,
-            unsafe_allow_html=True,
-        )
-        
-        # Display table with borders - Header using Streamlit columns for perfect alignment
-        st.markdown('<div class="table-wrapper">', unsafe_allow_html=True)
-        st.markdown('<div class="table-header-row">', unsafe_allow_html=True)
-        
-        # Use the same column proportions as data rows
-        h1, h2, h3, h4, h5, h6, h7 = st.columns([0.8, 2.5, 3.5, 1.2, 1.0, 1.0, 1.5])
-        
-        with h1:
-            st.markdown('<div class="table-header-cell">S.No</div>', unsafe_allow_html=True)
-        with h2:
-            st.markdown('<div class="table-header-cell" style="text-align:left;">Particulars</div>', unsafe_allow_html=True)
-        with h3:
-            st.markdown('<div class="table-header-cell" style="text-align:left;">Description</div>', unsafe_allow_html=True)
-        with h4:
-            st.markdown('<div class="table-header-cell">SAC</div>', unsafe_allow_html=True)
-        with h5:
-            st.markdown('<div class="table-header-cell">Qty</div>', unsafe_allow_html=True)
-        with h6:
-            st.markdown('<div class="table-header-cell">Rate</div>', unsafe_allow_html=True)
-        with h7:
-            st.markdown('<div class="table-header-cell">Taxable</div>', unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Get client ID for unique keys (use 0 if no client selected)
-        client_key = current_client_id if current_client_id is not None else 0
-        
-        for idx in range(len(st.session_state.rows)):
-            r = st.session_state.rows[idx]
-            # Create a row container
-            st.markdown('<div class="table-data-row">', unsafe_allow_html=True)
-            
-            # Use columns for the inputs
-            c1, c2, c3, c4, c5, c6, c7 = st.columns([0.8, 2.5, 3.5, 1.2, 1.0, 1.0, 1.5])
-            
-            with c1:
-                st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
-                new_sl = st.number_input("S.No", value=int(r.get('slno', idx+1)), min_value=1, step=1, key=f"sl_{client_key}_{idx}", label_visibility="collapsed")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with c2:
-                st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
-                new_part = st.text_input("Particulars", value=r.get('particulars', ''), key=f"part_{client_key}_{idx}", label_visibility="collapsed")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with c3:
-                st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
-                new_desc = st.text_input("Description", value=r.get('description', ''), key=f"desc_{client_key}_{idx}", label_visibility="collapsed")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with c4:
-                st.markdown('<div class="table-data-cell">', unsafe_allow_html=True)
-                new_sac = st.text_input("SAC", value=r.get('sac_code', ''), key=f"sac_{client_key}_{idx}", label_visibility="collapsed")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with c5:
-                st.markdown('<div class="table-data-cell table-data-cell-with-label"><div class="table-data-cell-label">Qty</div>', unsafe_allow_html=True)
-                new_qty = st.text_input("Qty", value=str(r.get('qty', '')), key=f"qty_{client_key}_{idx}", label_visibility="collapsed")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with c6:
-                st.markdown('<div class="table-data-cell table-data-cell-with-label"><div class="table-data-cell-label">Rate</div>', unsafe_allow_html=True)
-                new_rate = st.text_input("Rate", value=str(r.get('rate', '')), key=f"rate_{client_key}_{idx}", label_visibility="collapsed")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with c7:
-                try:
-                    qv = float(new_qty.replace(",", "")) if (new_qty and str(new_qty).strip() != "") else None
-                except:
-                    qv = None
-                try:
-                    rv = float(new_rate.replace(",", "")) if (new_rate and str(new_rate).strip() != "") else None
-                except:
-                    rv = None
-                taxable_val = (qv * rv) if (qv is not None and rv is not None) else None
-                st.markdown('<div class="table-data-cell table-data-cell-with-label"><div class="table-data-cell-label">Taxable</div>', unsafe_allow_html=True)
-                st.write(f"**Rs. {taxable_val:,.2f}**" if taxable_val is not None else "**-**")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Persist updates back to session_state
-            st.session_state.rows[idx].update({
-                "slno": new_sl,
-                "particulars": new_part,
-                "description": new_desc,
-                "sac_code": new_sac,
-                "qty": new_qty,
-                "rate": new_rate,
-            })
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-
-        if st.button("Add New Row (Bottom)"):
-            st.session_state.rows.append({"slno": len(st.session_state.rows)+1, "particulars":"", "description":"", "sac_code":"", "qty":"", "rate":""})
-            safe_rerun()
-
-        # Add CSS to make checkbox bold and visible
-        st.markdown(
-            """
-            <style>
-            /* Make Force IGST checkbox bold and visible */
-            div[data-testid="stCheckbox"] label {
-                font-weight: 700 !important;
-                font-size: 20px !important;
-                color: #1f2937 !important;
-            }
-            div[data-testid="stCheckbox"] label p {
-                font-weight: 700 !important;
-                font-size: 20px !important;
-                color: #1f2937 !important;
-                margin: 0 !important;
-            }
-            div[data-testid="stCheckbox"] {
-                margin-bottom: 8px !important;
-            }
-            /* Increase checkbox box size */
-            div[data-testid="stCheckbox"] input[type="checkbox"] {
-                width: 24px !important;
-                height: 24px !important;
-                min-width: 24px !important;
-                min-height: 24px !important;
-                margin-right: 12px !important;
-            }
-            div[data-testid="stCheckbox"] label {
-                padding: 8px 0 !important;
-                line-height: 1.5 !important;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
-        force_igst = st.checkbox("Force IGST manually", value=False)
-        advance_received = st.number_input("Advance Received (if any)", min_value=0.0, value=0.0)
-
-        subtotal_calc = 0.0
-        for r in st.session_state.rows:
-            try:
-                qv = float(str(r.get('qty','')).replace(",","")) if (r.get('qty') and str(r.get('qty')).strip()!="") else None
-            except:
-                qv = None
-            try:
-                rv = float(str(r.get('rate','')).replace(",","")) if (r.get('rate') and str(r.get('rate')).strip()!="") else None
-            except:
-                rv = None
-            if qv is not None and rv is not None:
-                subtotal_calc += (qv * rv)
-
-        # Render on-screen preview that resembles the invoice layout
         # Update client_info with purchase_order from form if provided
         if client_info:
             client_info_copy = client_info.copy()
@@ -1914,32 +2412,21 @@ def main():
             "training_exam_dates": training_exam_dates,
             "process_name": process_name
         }
-        try:
-            render_invoice_preview(preview_meta, st.session_state.rows, subtotal_calc, force_igst, advance_received)
-        except Exception as e:
-            # If preview fails for any reason, still show subtotal
-            st.write("Preview unavailable")
-            st.error(f"Preview error: {str(e)}")
-
-        st.metric("Subtotal", f"Rs. {subtotal_calc:,.2f}")
-
-        # Initialize supporting_df variable
-        if "supporting_df" not in st.session_state:
-            st.session_state.supporting_df = None
+        # Get client ID for unique keys (use 0 if no client selected)
+        client_key = current_client_id if current_client_id is not None else 0
+        force_igst, advance_received, subtotal_calc = render_line_items(client_key, preview_meta)
 
+        # Only the preview rows are parsed here; the full sheet is parsed when the PDF is generated,
+        # so reruns don't copy a large sheet out of the cache just to show five rows
+        supporting_upload = None
         uploaded_file = st.file_uploader("Upload Supporting Excel (.xlsx/.csv)", type=["xlsx","csv"])
         if uploaded_file:
             try:
-                if uploaded_file.name.lower().endswith(".csv"):
-                    st.session_state.supporting_df = pd.read_csv(uploaded_file)
-                else:
-                    st.session_state.supporting_df = pd.read_excel(uploaded_file)
-                st.dataframe(st.session_state.supporting_df.head())
+                supporting_upload = (uploaded_file.name, uploaded_file.getvalue())
+                st.table(parse_supporting(*supporting_upload, nrows=5))  # small static preview
             except Exception as e:
                 st.error(f"Error reading file: {e}")
-                st.session_state.supporting_df = None
-        else:
-            st.session_state.supporting_df = None
+                supporting_upload = None
 
         # Add CSS to make Generate PDF button more visible
         st.markdown(
@@ -1991,9 +2478,14 @@ def main():
                         "process_name": process_name
                     }
                     try:
-                        pdf_path = generate_invoice_pdf(meta, st.session_state.rows, st.session_state.supporting_df)
+                        # Build on the worker pool with a snapshot of the rows so widget updates can't race the build
+                        rows_snapshot = copy.deepcopy(st.session_state.rows)
+                        supporting_df = parse_supporting(*supporting_upload) if supporting_upload else None
+                        fut = get_pdf_executor().submit(generate_invoice_pdf, meta, rows_snapshot, supporting_df)
+                        with st.spinner("Generating PDF..."):
+                            pdf_path = fut.result()
                         subtotal_dec = subtotal_calc
-                        comp_state = gst_state_code(COMPANY.get('gstin',''))
+                        comp_state = COMPANY_STATE_CODE
                         cli_state = gst_state_code(client_info.get('gstin',''))
                         auto_igst = False
                         if comp_state and cli_state and comp_state != cli_state:
@@ -2008,20 +2500,15 @@ def main():
                             igst_val = 0.0
                         total_val = subtotal_dec + sgst_val + cgst_val + igst_val - float(advance_received)
                         # Save invoice to MySQL database
-                        query = """
-                            INSERT INTO invoices 
-                            (invoice_no, invoice_date, client_id, subtotal, sgst, cgst, igst, total, pdf_path) 
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
                         params = (meta['invoice_no'], invoice_date.strftime("%Y-%m-%d"), client_info['id'], 
                                  subtotal_dec, sgst_val, cgst_val, igst_val, total_val, pdf_path)
-                        execute_query(query, params, commit=True)
+                        save_invoices([params])
                         st.success(f"PDF generated: {pdf_path}")
                         with open(pdf_path, "rb") as f:
                             st.download_button("Download PDF", f, file_name=os.path.basename(pdf_path), mime="application/pdf")
-                    except Exception:
-                        st.error("Error generating PDF. See traceback:")
-                        st.text(traceback.format_exc())
+                    except Exception as e:
+                        st.error("Error generating PDF:")
+                        st.exception(e)
 
     # History
     else:
@@ -2033,27 +2520,19 @@ def main():
             end_date = st.date_input("To", value=date.today())
         with col3:
             refresh = st.button("Refresh")
+        if refresh:
+            invalidate_history_cache()
         
         try:
-            query = """
-                SELECT inv.id, inv.invoice_no, inv.invoice_date, c.name AS client_name, 
-                       c.gstin AS client_gstin, c.purchase_order,
-                       inv.subtotal, inv.sgst, inv.cgst, inv.igst, inv.total, inv.pdf_path
-                FROM invoices inv
-                LEFT JOIN clients c ON inv.client_id = c.id
-                WHERE inv.invoice_date BETWEEN %s AND %s
-                ORDER BY inv.id DESC
-            """
-            rows = fetch_all(query, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
-            # Convert to DataFrame
-            if rows:
-                dfhist = pd.DataFrame(rows, columns=[
-                    'id', 'invoice_no', 'invoice_date', 'client_name', 
-                    'client_gstin', 'purchase_order',
-                    'subtotal', 'sgst', 'cgst', 'igst', 'total', 'pdf_path'
-                ])
-            else:
-                dfhist = pd.DataFrame()
+            # Only one page of invoices is fetched and sent to the browser per rerun
+            date_params = (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+            total_rows = count_invoices(*date_params)
+            total_pages = max(1, -(-total_rows // HISTORY_PAGE_SIZE))
+            # Keyed on the date range so the page resets to 1 when the range changes
+            page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages, value=1, step=1,
+                                   key=f"hist_page_{date_params[0]}_{date_params[1]}")
+            offset = (page - 1) * HISTORY_PAGE_SIZE
+            dfhist = fetch_invoice_page(*date_params, page)
         except Exception as e:
             st.error(f"Error fetching invoice history: {e}")
             dfhist = pd.DataFrame()
@@ -2061,11 +2540,12 @@ def main():
         if dfhist.empty:
             st.info("No invoices in selected date range.")
         else:
+            st.caption(f"Showing {offset + 1}-{offset + len(dfhist)} of {total_rows} invoices")
             st.dataframe(dfhist)
 
 if __name__ == "__main__":
     try:
         main()
-    except Exception:
-        st.error("App crashed. See traceback:")
-        st.text(traceback.format_exc())
+    except Exception as e:
+        st.error("App crashed:")
+        st.exception(e)